@@ -1,9 +1,10 @@
 
 import matplotlib.pyplot as plt
 import numpy as np
-import pandas as pd
 
-from risk_model import GroundingRiskModel, ScenarioAnalysisParameters, RiskModelConfiguration
+from risk_model import GroundingRiskModel, ScenarioAnalysisParameters, RiskModelConfiguration, \
+    TrajectoryRecordingConfiguration, DECIMATED_RECORDING
+from shoreline import ShorelineIndex
 from ship_in_transit_simulator.models import SimulationConfiguration, \
     EnvironmentConfiguration, ShipConfiguration
 
@@ -41,6 +42,7 @@ if __name__ == '__main__':
     )
 
     shore = enc.shore.geometry
+    shore_index = ShorelineIndex(shore)
 
     # States of the ship for which we are calculating the grounding risk
     north_position = 7098718
@@ -84,37 +86,36 @@ if __name__ == '__main__':
         wind_speed=12,
         wind_direction=0
     )
+    snap_shot_interval = 20
+
+    # The drift trajectory is plotted below, so always simulate it
     grounding_risk = GroundingRiskModel(
         risk_model_config=risk_configuration,
         env_config=current_environmental_conditions,
         environment=shore,
+        shoreline_index=shore_index,
         scenario_params=scenario_analysis_parameters,
         sim_config=drifting_sim_setup,
-        ttg_sim_config=drifting_ship_setup
+        ttg_sim_config=drifting_ship_setup,
+        use_reachability_prescreen=False,
+        trajectory_recording=TrajectoryRecordingConfiguration(mode=DECIMATED_RECORDING,
+                                                              decimation_interval_s=snap_shot_interval)
     )
 
+    # The drift simulation runs when the risk is first requested
+    print("Risk of grounding: ", grounding_risk.risk_model_output)
+
     # Plot ship poses every "snap_shot_interval" second
-    drifting_ship_data = pd.DataFrame().from_dict(grounding_risk.ttg_simulator.ship_model.simulation_results)
-    snap_shot_interval = 20
-    time_since_snap_shot = 20
-    id = 0
+    drifting_ship_data = grounding_risk.ttg_simulator.trajectory
     ship_poses = []
-    for  east, north, yaw, time in zip(
+    for id, (east, north, yaw) in enumerate(zip(
             drifting_ship_data['east position [m]'],
             drifting_ship_data['north position [m]'],
-            drifting_ship_data['yaw angle [deg]'],
-            drifting_ship_data['time [s]']
-    ):
-        if time_since_snap_shot >= snap_shot_interval:
-            ship_poses.append((id, int(east), int(north), yaw, "red"))
-            id += 1
-            time_since_snap_shot = 0
-        else:
-            time_since_snap_shot += grounding_risk.ttg_simulator.ship_model.int.dt
+            drifting_ship_data['yaw angle [deg]']
+    )):
+        ship_poses.append((id, int(east), int(north), yaw, "red"))
 
     enc.add_vessels(*ship_poses)
 
-    print("Risk of grounding: ", grounding_risk.calculate_risk_output())
-
     enc.show_display()
     plt.show()
\ No newline at end of file
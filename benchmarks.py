@@ -0,0 +1,334 @@
+"""
+    Benchmarks of the drift simulator, the grounding check, the scenario calculations and
+    the accumulated risk in a prediction horizon, on synthetic shorelines of increasing
+    complexity. The ship is simulated with drift_model.DriftingShipModel, a local stand-in
+    for ShipModelWithoutPropulsion, so results do not depend on ship_in_transit_simulator.
+
+    Run with
+        python benchmarks.py --output results.json [--compare previous_results.json] [--quick]
+    Results are written as JSON, with one entry per benchmark and parameter set.
+
+    The time to import the core modules (risk_core, drift_model and scenarios) in a fresh
+    interpreter is also measured (see import_time.py). test_import_time.py asserts that
+    it is within IMPORT_TIME_BUDGET_MS and that importing them loads none of
+    CORE_EXCLUDED_MODULES, and the script exits with an error if either does not hold.
+
+    If ship_in_transit_simulator is not installed, the script registers stand-in
+    configurations under its name before running the benchmarks. Importing this module
+    does not.
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import types
+from typing import Callable, NamedTuple
+
+import numpy as np
+import shapely
+import shapely.geometry as geo
+
+from drift_model import DriftingShipModel
+from import_time import CORE_MODULES, IMPORT_TIME_BUDGET_MS, measure_import_time
+from risk_core import AccumulatedRiskInPredictionHorizon, CompiledLossOfMainEngineScenario, MotionStateInput, \
+    ScenarioAnalysisParameters
+from shoreline import ShorelineIndex
+
+
+class _ShipConfiguration(NamedTuple):
+    coefficient_of_deadweight_to_displacement: float
+    bunkers: float
+    ballast: float
+    length_of_ship: float
+    width_of_ship: float
+    added_mass_coefficient_in_surge: float
+    added_mass_coefficient_in_sway: float
+    added_mass_coefficient_in_yaw: float
+    dead_weight_tonnage: float
+    mass_over_linear_friction_coefficient_in_surge: float
+    mass_over_linear_friction_coefficient_in_sway: float
+    mass_over_linear_friction_coefficient_in_yaw: float
+    nonlinear_friction_coefficient__in_surge: float
+    nonlinear_friction_coefficient__in_sway: float
+    nonlinear_friction_coefficient__in_yaw: float
+
+
+class _EnvironmentConfiguration(NamedTuple):
+    current_velocity_component_from_north: float
+    current_velocity_component_from_east: float
+    wind_speed: float
+    wind_direction: float
+
+
+class _SimulationConfiguration(NamedTuple):
+    initial_north_position_m: float
+    initial_east_position_m: float
+    initial_yaw_angle_rad: float
+    initial_forward_speed_m_per_s: float
+    initial_sideways_speed_m_per_s: float
+    initial_yaw_rate_rad_per_s: float
+    integration_step: float
+    simulation_time: float
+
+
+def _use_stand_in_if_simulator_is_missing():
+    ''' risk_model imports ship_in_transit_simulator. If it is not installed, register
+        stand-in configurations and DriftingShipModel under its module name so that the
+        benchmarks can still run. Only called when run as a script.
+    '''
+    try:
+        import ship_in_transit_simulator.models  # noqa: F401
+    except ImportError:
+        from drift_model import DriftingShipModel
+        models = types.ModuleType('ship_in_transit_simulator.models')
+        models.ShipConfiguration = _ShipConfiguration
+        models.EnvironmentConfiguration = _EnvironmentConfiguration
+        models.SimulationConfiguration = _SimulationConfiguration
+        models.ShipModelWithoutPropulsion = DriftingShipModel
+        package = types.ModuleType('ship_in_transit_simulator')
+        package.models = models
+        sys.modules['ship_in_transit_simulator'] = package
+        sys.modules['ship_in_transit_simulator.models'] = models
+
+
+
+SHIP_CONFIGURATION = _ShipConfiguration(
+    coefficient_of_deadweight_to_displacement=0.7,
+    bunkers=200000,
+    ballast=200000,
+    length_of_ship=80,
+    width_of_ship=16,
+    added_mass_coefficient_in_surge=0.4,
+    added_mass_coefficient_in_sway=0.4,
+    added_mass_coefficient_in_yaw=0.4,
+    dead_weight_tonnage=3850000,
+    mass_over_linear_friction_coefficient_in_surge=130,
+    mass_over_linear_friction_coefficient_in_sway=18,
+    mass_over_linear_friction_coefficient_in_yaw=90,
+    nonlinear_friction_coefficient__in_surge=2400,
+    nonlinear_friction_coefficient__in_sway=4000,
+    nonlinear_friction_coefficient__in_yaw=400
+)
+ENVIRONMENT_CONFIGURATION = _EnvironmentConfiguration(
+    current_velocity_component_from_north=-2,
+    current_velocity_component_from_east=1,
+    wind_speed=12,
+    wind_direction=0
+)
+SCENARIO_PARAMETERS = ScenarioAnalysisParameters(
+    main_engine_failure_rate=3e-9,
+    main_engine_mean_restart_time=50,
+    main_engine_restart_time_std=1.2,
+    main_engine_restart_time_shift=20,
+    main_engine_nominal_restart_prob=0.4,
+)
+SHORELINE_VERTICES = [10, 100, 1000, 10000, 100000]
+HORIZON_LENGTHS = [10, 100, 1000, 10000]
+
+
+def synthetic_shoreline(number_of_vertices: int, radius: float = 3000.0,
+                        random_state: np.random.Generator = None) -> geo.MultiPolygon:
+    ''' Island centered at the origin (north = east = 0) with a rugged coastline of the
+        given number of vertices.
+    '''
+    if random_state is None:
+        random_state = np.random.default_rng(0)
+    angles = np.linspace(0, 2 * np.pi, number_of_vertices, endpoint=False)
+    radii = radius * (1 + 0.1 * np.sin(7 * angles) + 0.02 * random_state.standard_normal(number_of_vertices))
+    return geo.MultiPolygon([geo.Polygon(np.column_stack([radii * np.sin(angles), radii * np.cos(angles)]))])
+
+
+def best_time(function: Callable, repeats: int) -> float:
+    ''' Shortest wall time in seconds of `repeats` calls to function.
+    '''
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def benchmark_time_to_grounding(vertices, repeats, simulation_time):
+    ''' Steps per second of TimeToGroundingSimulator.time_to_grounding for a ship drifting
+        towards the island, without recording the trajectory.
+    '''
+    from risk_model import NO_RECORDING, TimeToGroundingSimulator, TrajectoryRecordingConfiguration
+
+    results = []
+    for number_of_vertices in vertices:
+        shoreline = synthetic_shoreline(number_of_vertices)
+        shoreline_index = ShorelineIndex(shoreline)
+        simulation_config = _SimulationConfiguration(
+            initial_north_position_m=8000, initial_east_position_m=0, initial_yaw_angle_rad=np.pi,
+            initial_forward_speed_m_per_s=3, initial_sideways_speed_m_per_s=0, initial_yaw_rate_rad_per_s=0,
+            integration_step=0.5, simulation_time=simulation_time
+        )
+        steps = []
+
+        def run():
+            simulator = TimeToGroundingSimulator(
+                initial_states=MotionStateInput(*simulation_config[:6]),
+                environment=shoreline,
+                max_simulation_time=simulation_time,
+                ship_config=SHIP_CONFIGURATION,
+                simulation_config=simulation_config,
+                environment_config=ENVIRONMENT_CONFIGURATION,
+                shoreline_index=shoreline_index,
+                trajectory_recording=TrajectoryRecordingConfiguration(mode=NO_RECORDING),
+                ship_model_factory=DriftingShipModel
+            )
+            simulator.time_to_grounding()
+            steps.append(round(simulator.ship_model.int.time / simulation_config.integration_step))
+        seconds = best_time(run, repeats)
+        results.append(_result('time_to_grounding', {'vertices': number_of_vertices}, steps[-1] / seconds,
+                               'steps/s'))
+    return results
+
+
+def benchmark_check_if_grounded(vertices, repeats, number_of_points):
+    ''' Cost per TimeToGroundingSimulator.check_if_grounded call at random positions
+        around the island, compared to the direct shapely distance query.
+    '''
+    from risk_model import TimeToGroundingSimulator
+
+    results = []
+    random_state = np.random.default_rng(1)
+    for number_of_vertices in vertices:
+        shoreline = synthetic_shoreline(number_of_vertices)
+        simulator = TimeToGroundingSimulator(
+            initial_states=None,
+            environment=shoreline,
+            max_simulation_time=1,
+            ship_config=SHIP_CONFIGURATION,
+            simulation_config=_SimulationConfiguration(0, 0, 0, 0, 0, 0, 0.5, 1),
+            environment_config=ENVIRONMENT_CONFIGURATION,
+            ship_model_factory=DriftingShipModel
+        )
+        norths = random_state.uniform(-4000, 4000, number_of_points)
+        easts = random_state.uniform(-4000, 4000, number_of_points)
+        seconds = best_time(lambda: [simulator.check_if_grounded(north, east) for north, east in zip(norths, easts)],
+                            repeats)
+        results.append(_result('check_if_grounded', {'vertices': number_of_vertices},
+                               1e6 * seconds / number_of_points, 'us/call'))
+        seconds = best_time(lambda: [geo.Point(east, north).distance(shoreline) <= 50
+                                     for north, east in zip(norths, easts)], repeats)
+        results.append(_result('point_distance_check', {'vertices': number_of_vertices},
+                               1e6 * seconds / number_of_points, 'us/call'))
+    return results
+
+
+def benchmark_scenarios(repeats, number_of_evaluations):
+    ''' LossOfMainEngineScenario evaluations per second, object based and compiled.
+    '''
+    from risk_model import LossOfMainEngineScenario
+
+    times_available = np.linspace(0, 1000, number_of_evaluations)
+    seconds = best_time(lambda: [LossOfMainEngineScenario(time_available, 10, SCENARIO_PARAMETERS)
+                                 .scenario_probabilities() for time_available in times_available], repeats)
+    results = [_result('loss_of_main_engine_scenario', {'form': 'objects'}, number_of_evaluations / seconds,
+                       'evaluations/s')]
+    compiled = CompiledLossOfMainEngineScenario(10, SCENARIO_PARAMETERS)
+    seconds = best_time(lambda: compiled.scenario_probabilities(times_available), repeats)
+    results.append(_result('loss_of_main_engine_scenario', {'form': 'compiled'}, number_of_evaluations / seconds,
+                           'evaluations/s'))
+    return results
+
+
+def benchmark_accumulated_risk(horizon_lengths, repeats):
+    ''' Wall time of AccumulatedRiskInPredictionHorizon for increasing horizon lengths,
+        built at once and by appending one interval at a time.
+    '''
+    results = []
+    random_state = np.random.default_rng(2)
+    for horizon_length in horizon_lengths:
+        probabilities = random_state.uniform(0, 1e-3, horizon_length)
+        consequences = random_state.uniform(0, 1e6, horizon_length)
+        seconds = best_time(lambda: AccumulatedRiskInPredictionHorizon(probabilities, consequences), repeats)
+        results.append(_result('accumulated_risk', {'intervals': horizon_length, 'form': 'batch'}, seconds, 's'))
+
+        def append_all():
+            horizon = AccumulatedRiskInPredictionHorizon([], [])
+            for probability, consequence in zip(probabilities, consequences):
+                horizon.append(probability, consequence)
+        seconds = best_time(append_all, repeats)
+        results.append(_result('accumulated_risk', {'intervals': horizon_length, 'form': 'append'}, seconds, 's'))
+    return results
+
+
+def benchmark_import_time(repeats):
+    ''' Time to import the core modules in a fresh interpreter (excluding the start of
+        the interpreter itself), and the excluded modules they load.
+    '''
+    import_time_ms, excluded = measure_import_time(CORE_MODULES, repeats)
+    return [_result('core_import_time', {'modules': CORE_MODULES}, import_time_ms, 'ms')], excluded
+
+
+def _result(name, parameters, value, unit):
+    return {'name': name, 'parameters': parameters, 'value': float(value), 'unit': unit}
+
+
+def run_benchmarks(quick: bool = False) -> dict:
+    vertices = SHORELINE_VERTICES[:3] if quick else SHORELINE_VERTICES
+    repeats = 1 if quick else 3
+    results, excluded_modules_loaded = benchmark_import_time(repeats=3 if quick else 10)
+    results += benchmark_time_to_grounding(vertices, repeats, simulation_time=200 if quick else 1000)
+    results += benchmark_check_if_grounded(vertices, repeats, number_of_points=200 if quick else 2000)
+    results += benchmark_scenarios(repeats, number_of_evaluations=200 if quick else 2000)
+    results += benchmark_accumulated_risk(HORIZON_LENGTHS[:3] if quick else HORIZON_LENGTHS, repeats)
+    return {
+        'metadata': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': np.__version__,
+            'shapely': shapely.__version__,
+            'quick': quick,
+            'excluded_modules_loaded_by_core': excluded_modules_loaded,
+        },
+        'results': results,
+    }
+
+
+def compare(results: dict, previous_results: dict):
+    ''' Print the ratio of each result to the matching result of a previous run.
+    '''
+    previous = {(result['name'], json.dumps(result['parameters'], sort_keys=True)): result
+                for result in previous_results['results']}
+    for result in results['results']:
+        key = (result['name'], json.dumps(result['parameters'], sort_keys=True))
+        if key in previous:
+            ratio = result['value'] / previous[key]['value'] if previous[key]['value'] else float('nan')
+            print(f"{result['name']:32s} {key[1]:45s} {result['value']:12.4g} {result['unit']:14s} "
+                  f"x{ratio:.2f} vs previous")
+
+
+if __name__ == '__main__':
+    _use_stand_in_if_simulator_is_missing()
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', default='bench_output.json', help='File to write the results to')
+    parser.add_argument('--compare', help='Results of a previous run to compare with')
+    parser.add_argument('--quick', action='store_true', help='Fewer and smaller cases')
+    parser.add_argument('--import-time-budget-ms', type=float, default=IMPORT_TIME_BUDGET_MS,
+                        help='Maximum time to import the core modules')
+    arguments = parser.parse_args()
+
+    benchmark_results = run_benchmarks(quick=arguments.quick)
+    with open(arguments.output, 'w') as output_file:
+        json.dump(benchmark_results, output_file, indent=2)
+    for benchmark_result in benchmark_results['results']:
+        print(f"{benchmark_result['name']:32s} {json.dumps(benchmark_result['parameters']):45s} "
+              f"{benchmark_result['value']:12.4g} {benchmark_result['unit']}")
+    if arguments.compare:
+        with open(arguments.compare) as previous_file:
+            compare(benchmark_results, json.load(previous_file))
+
+    import_time_ms = next(result['value'] for result in benchmark_results['results']
+                          if result['name'] == 'core_import_time')
+    excluded_modules_loaded = benchmark_results['metadata']['excluded_modules_loaded_by_core']
+    if excluded_modules_loaded:
+        sys.exit(f'Importing {CORE_MODULES} loads {excluded_modules_loaded}')
+    if import_time_ms > arguments.import_time_budget_ms:
+        sys.exit(f'Importing {CORE_MODULES} takes {import_time_ms:.0f} ms, '
+                 f'more than the budget of {arguments.import_time_budget_ms:.0f} ms')
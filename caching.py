@@ -0,0 +1,92 @@
+"""
+    Provides a bounded least-recently-used cache of times to grounding, keyed on the
+    quantized initial states, wind, current and chart, so that vessels re-evaluated with
+    almost unchanged states do not need a new drift simulation.
+"""
+import math
+from collections import OrderedDict
+from typing import Hashable, NamedTuple, Optional
+
+
+class QuantizationTolerances(NamedTuple):
+    ''' Resolution of each quantity in the cache key. States and environments that
+        round to the same multiples of these tolerances share a cache entry.
+    '''
+    position_m: float = 5.0
+    yaw_angle_rad: float = 0.01
+    speed_m_per_s: float = 0.05
+    yaw_rate_rad_per_s: float = 0.001
+    wind_speed_m_per_s: float = 0.25
+    wind_direction_rad: float = 0.02
+    current_m_per_s: float = 0.05
+
+
+class CacheStatistics(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    size: int
+
+
+class TimeToGroundingCache:
+    ''' Least-recently-used cache of times to grounding with at most `max_size` entries.
+    '''
+
+    def __init__(self, max_size: int = 10000,
+                 tolerances: QuantizationTolerances = QuantizationTolerances()):
+        self.max_size = max_size
+        self.tolerances = tolerances
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def key(self, initial_states, environment_config, chart_id: Hashable, *context: Hashable) -> tuple:
+        ''' Cache key for a MotionStateInput and an EnvironmentConfiguration on the chart
+            identified by `chart_id`. Any other hashable values the time to grounding
+            depends on, such as the ship configuration, can be passed as `context`.
+        '''
+        tolerances = self.tolerances
+        return (
+            chart_id,
+            _quantize(initial_states.north_position, tolerances.position_m),
+            _quantize(initial_states.east_position, tolerances.position_m),
+            _quantize(initial_states.yaw_angle_rad % (2 * math.pi), tolerances.yaw_angle_rad),
+            _quantize(initial_states.surge_speed, tolerances.speed_m_per_s),
+            _quantize(initial_states.sway_speed, tolerances.speed_m_per_s),
+            _quantize(initial_states.yaw_rate, tolerances.yaw_rate_rad_per_s),
+            _quantize(environment_config.wind_speed, tolerances.wind_speed_m_per_s),
+            _quantize(environment_config.wind_direction % (2 * math.pi), tolerances.wind_direction_rad),
+            _quantize(environment_config.current_velocity_component_from_north, tolerances.current_m_per_s),
+            _quantize(environment_config.current_velocity_component_from_east, tolerances.current_m_per_s),
+        ) + context
+
+    def get(self, key: tuple) -> Optional[float]:
+        ''' Cached time to grounding for the key, or None. Counts a hit or a miss.
+        '''
+        time_to_grounding = self._entries.get(key)
+        if time_to_grounding is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return time_to_grounding
+
+    def put(self, key: tuple, time_to_grounding: float):
+        self._entries[key] = time_to_grounding
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    @property
+    def statistics(self) -> CacheStatistics:
+        return CacheStatistics(hits=self.hits, misses=self.misses, evictions=self.evictions,
+                               size=len(self._entries))
+
+
+def _quantize(value: float, tolerance: float) -> int:
+    return int(round(value / tolerance))
@@ -0,0 +1,109 @@
+"""
+    Provides the consequence of a grounding from the speed of impact and the character
+    of the shore that is hit (e.g. fish farms or other infrastructure), looked up from
+    attributed shore segments in a spatial index.
+"""
+from typing import NamedTuple, Sequence, Tuple
+
+import numpy as np
+import shapely
+import shapely.geometry as geo
+
+from shoreline import shoreline_segments
+
+
+class ShoreCharacter(NamedTuple):
+    ''' Cost of grounding on a kind of shore: a fixed cost plus a cost per m/s of impact
+        speed.
+    '''
+    name: str
+    fixed_cost: float
+    cost_per_impact_speed: float
+
+
+class GroundingOutcome(NamedTuple):
+    ''' Result of a drift simulation. If the ship did not ground, the impact point and
+        speed are the position and speed over ground when the simulation was terminated.
+    '''
+    time_to_grounding: float
+    grounded: bool
+    impact_north: float
+    impact_east: float
+    impact_speed: float
+    consequence: float
+
+
+class ShoreCharacterIndex:
+    ''' Spatial index over shore segments, each attributed with one of a list of shore
+        characters. The character of the shore at a grounding position is the character
+        of the nearest segment, found with one nearest query in an STRtree, so the cost
+        of a lookup does not depend on the number of characters.
+    '''
+
+    def __init__(self, segments: Sequence[geo.LineString], character_indices: Sequence[int],
+                 characters: Sequence[ShoreCharacter]):
+        ''' args:
+            - segments: Shore segments as shapely geometries with (east, north) coordinates.
+            - character_indices: Index into `characters` of each segment.
+            - characters: The shore characters.
+        '''
+        self.segments = np.asarray(segments, dtype=object)
+        self.character_indices = np.asarray(character_indices, dtype=int)
+        if len(self.segments) != len(self.character_indices):
+            raise ValueError('Each shore segment needs a character index')
+        self.characters = list(characters)
+        self.fixed_costs = np.array([character.fixed_cost for character in self.characters], dtype=float)
+        self.costs_per_impact_speed = np.array([character.cost_per_impact_speed for character in self.characters],
+                                               dtype=float)
+        self.tree = shapely.STRtree(self.segments)
+
+    @classmethod
+    def from_shoreline(cls, shoreline: geo.base.BaseGeometry, characters: Sequence[ShoreCharacter],
+                       regions: Sequence[Tuple[geo.base.BaseGeometry, int]] = ()) -> 'ShoreCharacterIndex':
+        ''' Attribute the edges of the shoreline. Edges intersecting one of the (region,
+            character index) pairs get the character of the first such region, all other
+            edges get the first character.
+        '''
+        segments = shoreline_segments(shoreline)
+        character_indices = np.zeros(len(segments), dtype=int)
+        assigned = np.zeros(len(segments), dtype=bool)
+        tree = shapely.STRtree(segments)
+        for region, character_index in regions:
+            intersecting = tree.query(region, predicate='intersects')
+            intersecting = intersecting[~assigned[intersecting]]
+            character_indices[intersecting] = character_index
+            assigned[intersecting] = True
+        return cls(segments=segments, character_indices=character_indices, characters=characters)
+
+    def character_indices_at(self, north: np.ndarray, east: np.ndarray) -> np.ndarray:
+        ''' Index of the character of the nearest shore segment to each position.
+        '''
+        north = np.asarray(north, dtype=float)
+        east = np.asarray(east, dtype=float)
+        points = shapely.points(east.ravel(), north.ravel())
+        point_indices, segment_indices = self.tree.query_nearest(points, all_matches=False)
+        result = np.zeros(points.shape, dtype=int)
+        result[point_indices] = self.character_indices[segment_indices]
+        return result.reshape(north.shape)
+
+    def character_at(self, north: float, east: float) -> ShoreCharacter:
+        return self.characters[int(self.character_indices_at(north, east))]
+
+    def consequences(self, north: np.ndarray, east: np.ndarray, impact_speed: np.ndarray,
+                     grounded: np.ndarray) -> np.ndarray:
+        ''' Consequence of grounding at each position with the given speed. For ships that
+            have not grounded, the cheapest shore character at that speed is used.
+        '''
+        impact_speed = np.asarray(impact_speed, dtype=float)
+        grounded = np.broadcast_to(np.asarray(grounded, dtype=bool), impact_speed.shape)
+        cheapest = np.min(self.fixed_costs[:, np.newaxis]
+                          + self.costs_per_impact_speed[:, np.newaxis] * impact_speed.ravel(), axis=0)
+        result = cheapest.reshape(impact_speed.shape)
+        if np.any(grounded):
+            indices = self.character_indices_at(np.asarray(north)[grounded], np.asarray(east)[grounded])
+            result[grounded] = self.fixed_costs[indices] + self.costs_per_impact_speed[indices] * impact_speed[grounded]
+        return result
+
+    def consequence(self, north: float, east: float, impact_speed: float, grounded: bool = True) -> float:
+        return float(self.consequences(np.array([north]), np.array([east]), np.array([impact_speed]),
+                                       np.array([grounded]))[0])
@@ -0,0 +1,589 @@
+"""
+    NumPy implementation of the 3-DOF equations of motion of a ship drifting without
+    propulsion, following ShipModelWithoutPropulsion from ship_in_transit_simulator,
+    and a simulator that drifts many ships in lockstep until they ground.
+"""
+from typing import NamedTuple, Sequence, Union
+
+import numpy as np
+
+
+# Distance in meters from the shoreline within which a ship is considered grounded
+GROUNDING_DISTANCE_M = 50
+
+# Wind load constants used by ShipModelWithoutPropulsion
+AIR_DENSITY = 1.2
+HEIGHT_ABOVE_WATER_FRONT = 8.0
+HEIGHT_ABOVE_WATER_SIDE = 8.0
+WIND_COEFFICIENT_SURGE = 0.5
+WIND_COEFFICIENT_SWAY = 0.7
+WIND_COEFFICIENT_YAW = 0.08
+
+# Columns of the state arrays, in the same order as MotionStateInput
+NORTH, EAST, YAW, SURGE, SWAY, YAW_RATE = range(6)
+
+
+class DriftModelParameters(NamedTuple):
+    ''' Parameters of the drifting ship model. The environment fields are either
+        floats, or arrays with one value per ship.
+    '''
+    mass: float
+    moment_of_inertia: float
+    added_mass_surge: float
+    added_mass_sway: float
+    added_mass_yaw: float
+    linear_damping_surge: float
+    linear_damping_sway: float
+    linear_damping_yaw: float
+    nonlinear_damping_surge: float
+    nonlinear_damping_sway: float
+    nonlinear_damping_yaw: float
+    length_of_ship: float
+    projected_area_front: float
+    projected_area_side: float
+    current_velocity_component_from_north: Union[float, np.ndarray]
+    current_velocity_component_from_east: Union[float, np.ndarray]
+    wind_speed: Union[float, np.ndarray]
+    wind_direction: Union[float, np.ndarray]
+
+
+def drift_model_parameters(ship_config, environment_config) -> DriftModelParameters:
+    ''' Derive model parameters from the ShipConfiguration and EnvironmentConfiguration
+        of ship_in_transit_simulator, the same way ShipModelWithoutPropulsion does.
+    '''
+    payload = 0.9 * (ship_config.dead_weight_tonnage - ship_config.bunkers)
+    lightweight = ship_config.dead_weight_tonnage / ship_config.coefficient_of_deadweight_to_displacement \
+        - ship_config.dead_weight_tonnage
+    mass = lightweight + payload + ship_config.bunkers + ship_config.ballast
+    moment_of_inertia = mass * (ship_config.length_of_ship ** 2 + ship_config.width_of_ship ** 2) / 12
+    return DriftModelParameters(
+        mass=mass,
+        moment_of_inertia=moment_of_inertia,
+        added_mass_surge=mass * ship_config.added_mass_coefficient_in_surge,
+        added_mass_sway=mass * ship_config.added_mass_coefficient_in_sway,
+        added_mass_yaw=moment_of_inertia * ship_config.added_mass_coefficient_in_yaw,
+        linear_damping_surge=mass / ship_config.mass_over_linear_friction_coefficient_in_surge,
+        linear_damping_sway=mass / ship_config.mass_over_linear_friction_coefficient_in_sway,
+        linear_damping_yaw=moment_of_inertia / ship_config.mass_over_linear_friction_coefficient_in_yaw,
+        nonlinear_damping_surge=ship_config.nonlinear_friction_coefficient__in_surge,
+        nonlinear_damping_sway=ship_config.nonlinear_friction_coefficient__in_sway,
+        nonlinear_damping_yaw=ship_config.nonlinear_friction_coefficient__in_yaw,
+        length_of_ship=ship_config.length_of_ship,
+        projected_area_front=ship_config.width_of_ship * HEIGHT_ABOVE_WATER_FRONT,
+        projected_area_side=ship_config.length_of_ship * HEIGHT_ABOVE_WATER_SIDE,
+        current_velocity_component_from_north=environment_config.current_velocity_component_from_north,
+        current_velocity_component_from_east=environment_config.current_velocity_component_from_east,
+        wind_speed=environment_config.wind_speed,
+        wind_direction=environment_config.wind_direction
+    )
+
+
+def select_ships(params: DriftModelParameters, ship_indices: np.ndarray) -> DriftModelParameters:
+    ''' Parameters for a subset of the ships. Scalar fields are shared by all ships
+        and are left as they are.
+    '''
+    return params._replace(**{
+        field: value[ship_indices]
+        for field, value in params._asdict().items() if np.ndim(value) > 0
+    })
+
+
+def drift_derivatives(states: np.ndarray, params: DriftModelParameters) -> np.ndarray:
+    ''' Time derivatives of the states of N drifting ships.
+
+        args:
+        - states (np.ndarray): Array of shape (N, 6) with columns ordered as
+        MotionStateInput (north, east, yaw angle, surge speed, sway speed, yaw rate).
+        - params (DriftModelParameters): Ship and environment parameters.
+
+        returns:
+        - derivatives (np.ndarray): Array of shape (N, 6)
+    '''
+    yaw = states[:, YAW]
+    u = states[:, SURGE]
+    v = states[:, SWAY]
+    r = states[:, YAW_RATE]
+    cos_yaw = np.cos(yaw)
+    sin_yaw = np.sin(yaw)
+    current_north = params.current_velocity_component_from_north
+    current_east = params.current_velocity_component_from_east
+
+    # Current and wind in the body frame
+    current_surge = cos_yaw * current_north + sin_yaw * current_east
+    current_sway = -sin_yaw * current_north + cos_yaw * current_east
+    u_r = u - current_surge
+    v_r = v - current_sway
+
+    u_rw = params.wind_speed * np.cos(params.wind_direction - yaw) - u
+    v_rw = params.wind_speed * np.sin(params.wind_direction - yaw) - v
+    gamma_rw = -np.arctan2(v_rw, u_rw)
+    dynamic_pressure = 0.5 * AIR_DENSITY * (u_rw ** 2 + v_rw ** 2)
+    wind_surge = -dynamic_pressure * WIND_COEFFICIENT_SURGE * np.cos(gamma_rw) * params.projected_area_front
+    wind_sway = dynamic_pressure * WIND_COEFFICIENT_SWAY * np.sin(gamma_rw) * params.projected_area_side
+    wind_yaw = dynamic_pressure * WIND_COEFFICIENT_YAW * np.sin(2 * gamma_rw) \
+        * params.projected_area_side * params.length_of_ship
+
+    # Rigid body and added mass Coriolis forces, damping and wind loads
+    mass = params.mass
+    surge_force = mass * v * r - params.added_mass_sway * v_r * r \
+        - (params.linear_damping_surge + params.nonlinear_damping_surge * u) * u_r + wind_surge
+    sway_force = -mass * u * r + params.added_mass_surge * u_r * r \
+        - (params.linear_damping_sway + params.nonlinear_damping_sway * v) * v_r + wind_sway
+    yaw_moment = (params.added_mass_sway - params.added_mass_surge) * u_r * v_r \
+        - (params.linear_damping_yaw + params.nonlinear_damping_yaw * r) * r + wind_yaw
+
+    derivatives = np.empty_like(states)
+    derivatives[:, NORTH] = cos_yaw * u - sin_yaw * v + current_north
+    derivatives[:, EAST] = sin_yaw * u + cos_yaw * v + current_east
+    derivatives[:, YAW] = r
+    derivatives[:, SURGE] = surge_force / (mass + params.added_mass_surge)
+    derivatives[:, SWAY] = sway_force / (mass + params.added_mass_sway)
+    derivatives[:, YAW_RATE] = yaw_moment / (params.moment_of_inertia + params.added_mass_yaw)
+    return derivatives
+
+
+def wind_drift_speed_limit(params: DriftModelParameters,
+                           relative_wind_speed: Union[float, np.ndarray] = None) -> Union[float, np.ndarray]:
+    ''' Speed through the water at which damping in surge and sway balances the largest
+        wind load a relative wind of `relative_wind_speed` (the wind speed if not given)
+        can give in each direction, combined over the two directions.
+    '''
+    if relative_wind_speed is None:
+        relative_wind_speed = params.wind_speed
+    dynamic_pressure = 0.5 * AIR_DENSITY * np.asarray(relative_wind_speed, dtype=float) ** 2
+    surge_limit = _terminal_speed(force=dynamic_pressure * WIND_COEFFICIENT_SURGE * params.projected_area_front,
+                                  linear_damping=params.linear_damping_surge,
+                                  nonlinear_damping=params.nonlinear_damping_surge)
+    sway_limit = _terminal_speed(force=dynamic_pressure * WIND_COEFFICIENT_SWAY * params.projected_area_side,
+                                 linear_damping=params.linear_damping_sway,
+                                 nonlinear_damping=params.nonlinear_damping_sway)
+    return np.hypot(surge_limit, sway_limit)
+
+
+def _terminal_speed(force, linear_damping, nonlinear_damping):
+    if nonlinear_damping == 0:
+        return force / linear_damping
+    return (np.sqrt(linear_damping ** 2 + 4 * nonlinear_damping * force) - linear_damping) \
+        / (2 * nonlinear_damping)
+
+
+# Empirical relative margin on the drift speed upper bound for the coupling between surge,
+# sway and yaw, which the terminal speeds in each direction do not account for. Without it,
+# the speed over ground exceeded the bound by up to 2% in the tests in test_drift_model.py.
+DRIFT_SPEED_SAFETY_FACTOR = 1.1
+
+
+def drift_speed_upper_bound(states: np.ndarray, params: DriftModelParameters) -> np.ndarray:
+    ''' Upper bound on the speed over ground of each ship while drifting from the given
+        states (array of shape (N, 6)).
+
+        Damping drives the speed relative to the current towards the wind drift speed
+        limit. The wind load depends on the wind relative to the ship, which is stronger
+        than the wind when the ship moves upwind, so the limit is found for a relative
+        wind of the wind speed plus the bound on the speed through the water. The
+        relative speed then stays below the larger of its initial value and that limit,
+        which is the smallest solution of the fixed point equation found by iterating
+        from the initial relative speed. The current enters both the relative speed and
+        the kinematics, so its speed is added twice. The result is multiplied by
+        DRIFT_SPEED_SAFETY_FACTOR.
+
+        This is a heuristic, not a proven bound. The added mass Coriolis forces move
+        kinetic energy between yaw, surge and sway. With a current they also do work on
+        the ship. The nonlinear damping is proportional to the signed speed, so it
+        weakens when the ship moves astern or to port. None of this is covered by the
+        terminal speeds. test_drift_model.py checks the bound against the simulation for
+        the default ship over 1000 s drifts, and for added mass coefficients from 0.02
+        to 1.5 and a range of damping settings over 120 s drifts. In that range, surge
+        and sway damping stay positive up to 15 m/s. Outside it, and in particular over
+        long drifts with weak damping, the drift model itself can diverge. The
+        reachability pre-screen should then be turned off.
+    '''
+    current_north = params.current_velocity_component_from_north
+    current_east = params.current_velocity_component_from_east
+    current_speed = np.hypot(current_north, current_east)
+    cos_yaw = np.cos(states[:, YAW])
+    sin_yaw = np.sin(states[:, YAW])
+    initial_relative_speed = np.hypot(states[:, SURGE] - (cos_yaw * current_north + sin_yaw * current_east),
+                                      states[:, SWAY] - (-sin_yaw * current_north + cos_yaw * current_east))
+    relative_speed_bound = initial_relative_speed
+    for _ in range(100):
+        next_bound = np.maximum(initial_relative_speed, wind_drift_speed_limit(
+            params, relative_wind_speed=np.abs(params.wind_speed) + relative_speed_bound + current_speed))
+        converged = np.all(next_bound - relative_speed_bound <= 1e-9 * (1 + next_bound))
+        relative_speed_bound = next_bound
+        if converged:
+            break
+    return DRIFT_SPEED_SAFETY_FACTOR * (relative_speed_bound + 2 * current_speed)
+
+
+def max_reachable_distances(states: np.ndarray, params: DriftModelParameters, max_simulation_time: float,
+                            integration_step: float = 0.0) -> np.ndarray:
+    ''' Upper bound on the distance each ship can drift from the given states (array of
+        shape (N, 6)), from the heuristic drift_speed_upper_bound. The fixed step
+        simulators run one `integration_step` past `max_simulation_time` before they
+        stop, so that step is included.
+    '''
+    return drift_speed_upper_bound(states, params) * (max_simulation_time + integration_step)
+
+
+def speeds_over_ground(states: np.ndarray, params: DriftModelParameters) -> np.ndarray:
+    ''' Speed over ground of each ship (array of shape (N, 6)), i.e. the speed through the
+        water plus the current, as in the position derivatives of drift_derivatives.
+    '''
+    cos_yaw = np.cos(states[:, YAW])
+    sin_yaw = np.sin(states[:, YAW])
+    north_speed = cos_yaw * states[:, SURGE] - sin_yaw * states[:, SWAY] + params.current_velocity_component_from_north
+    east_speed = sin_yaw * states[:, SURGE] + cos_yaw * states[:, SWAY] + params.current_velocity_component_from_east
+    return np.hypot(north_speed, east_speed)
+
+
+class BatchTimeToGroundingSimulator:
+    ''' Simulate many ships drifting from given initial states until each of them
+        grounds or the maximum simulation time has elapsed. All ships are integrated
+        together with the same explicit Euler scheme and time step as
+        TimeToGroundingSimulator, and ships are frozen once they ground.
+    '''
+
+    def __init__(self, initial_states: Union[Sequence, np.ndarray],
+                 shoreline_index,
+                 max_simulation_time: float,
+                 integration_step: float,
+                 params: DriftModelParameters):
+        ''' Set up simulation.
+
+            args:
+            - initial_states: Sequence of MotionStateInput, or array of shape (N, 6) with
+            the same column order.
+            - shoreline_index (ShorelineIndex or DistanceRaster): Index over the shoreline.
+            - max_simulation_time (float): Number of seconds after which to terminate
+            the simulation of ships that have not grounded.
+            - integration_step (float): Time step in seconds.
+            - params (DriftModelParameters): Use per-ship arrays for the environment
+            fields to simulate each ship in its own environment.
+        '''
+        self.states = np.array(initial_states, dtype=float).reshape(-1, 6)
+        self.shoreline_index = shoreline_index
+        self.max_sim_time = max_simulation_time
+        self.dt = integration_step
+        self.params = params
+        self.grounded = np.zeros(len(self.states), dtype=bool)
+
+    def time_to_grounding(self) -> np.ndarray:
+        ''' Integrate all ships and return an array of the number of seconds before each
+            of them grounds. Ships that do not ground get `max_simulation_time`, even
+            though the last step ends one integration step after it.
+
+            As in TimeToGroundingSimulator, the shoreline is only queried for ships that
+            have moved farther than their clearance since their last query.
+        '''
+        number_of_ships = len(self.states)
+        times_to_grounding = np.empty(number_of_ships)
+        checked_positions = self.states[:, [NORTH, EAST]].copy()
+        clearance = np.maximum(
+            self.shoreline_index.grounding_clearances(checked_positions[:, 0], checked_positions[:, 1],
+                                                      GROUNDING_DISTANCE_M), 0)
+
+        active = np.flatnonzero(~self.grounded)
+        active_params = select_ships(self.params, active)
+        time = 0.0
+        while time <= self.max_sim_time and len(active) > 0:
+            active_states = self.states[active]
+            active_states += self.dt * drift_derivatives(active_states, active_params)
+            self.states[active] = active_states
+            time = time + self.dt
+
+            displacement = np.hypot(active_states[:, NORTH] - checked_positions[active, 0],
+                                    active_states[:, EAST] - checked_positions[active, 1])
+            to_check = active[displacement >= clearance[active]]
+            if len(to_check) == 0:
+                continue
+            checked_positions[to_check] = self.states[to_check][:, [NORTH, EAST]]
+            clearance[to_check] = self.shoreline_index.grounding_clearances(
+                checked_positions[to_check, 0], checked_positions[to_check, 1], GROUNDING_DISTANCE_M)
+            newly_grounded = to_check[clearance[to_check] <= 0]
+            if len(newly_grounded) > 0:
+                self.grounded[newly_grounded] = True
+                times_to_grounding[newly_grounded] = time
+                active = np.flatnonzero(~self.grounded)
+                active_params = select_ships(self.params, active)
+        times_to_grounding[~self.grounded] = self.max_sim_time
+        return times_to_grounding
+
+
+
+def shoreline_out_of_reach(initial_states: np.ndarray, shoreline_index, params: DriftModelParameters,
+                           max_simulation_time: float, integration_step: float) -> np.ndarray:
+    ''' Whether each ship (array of shape (N, 6)) is farther from the shoreline than it can
+        drift before the simulation ends (see max_reachable_distances), so that it cannot
+        ground.
+    '''
+    clearances = shoreline_index.grounding_clearances(initial_states[:, NORTH], initial_states[:, EAST],
+                                                      GROUNDING_DISTANCE_M)
+    return clearances > max_reachable_distances(initial_states, params, max_simulation_time, integration_step)
+
+
+def screened_times_to_grounding(initial_states: np.ndarray, shoreline_index, params: DriftModelParameters,
+                                max_simulation_time: float, integration_step: float) -> np.ndarray:
+    ''' Time to grounding of each ship (array of shape (N, 6)), as found by
+        BatchTimeToGroundingSimulator. Only the ships that can reach the shoreline are
+        simulated, the others get `max_simulation_time` as the simulator gives ships that
+        do not ground.
+    '''
+    initial_states = np.asarray(initial_states, dtype=float).reshape(-1, 6)
+    times_to_grounding = np.full(len(initial_states), float(max_simulation_time))
+    within_reach = np.flatnonzero(~shoreline_out_of_reach(initial_states, shoreline_index, params,
+                                                          max_simulation_time, integration_step))
+    if len(within_reach) > 0:
+        times_to_grounding[within_reach] = BatchTimeToGroundingSimulator(
+            initial_states=initial_states[within_reach],
+            shoreline_index=shoreline_index,
+            max_simulation_time=max_simulation_time,
+            integration_step=integration_step,
+            params=select_ships(params, within_reach)
+        ).time_to_grounding()
+    return times_to_grounding
+
+
+class EulerClock:
+    ''' Time keeping of the Euler integrator of ship_in_transit_simulator.
+    '''
+
+    def __init__(self, dt: float, sim_time: float):
+        self.dt = dt
+        self.sim_time = sim_time
+        self.time = 0.0
+
+    def next_time(self):
+        self.time = self.time + self.dt
+
+
+class DriftingShipModel:
+    ''' Single ship drifting according to drift_derivatives, with the interface of
+        ShipModelWithoutPropulsion used by TimeToGroundingSimulator. Can be used in its
+        place, e.g. for benchmarking without ship_in_transit_simulator.
+    '''
+
+    def __init__(self, ship_config, environment_config, simulation_config):
+        self.params = drift_model_parameters(ship_config, environment_config)
+        self.states = np.array([[simulation_config.initial_north_position_m,
+                                 simulation_config.initial_east_position_m,
+                                 simulation_config.initial_yaw_angle_rad,
+                                 simulation_config.initial_forward_speed_m_per_s,
+                                 simulation_config.initial_sideways_speed_m_per_s,
+                                 simulation_config.initial_yaw_rate_rad_per_s]])
+        self.derivatives = np.zeros_like(self.states)
+        self.int = EulerClock(dt=simulation_config.integration_step, sim_time=simulation_config.simulation_time)
+
+    north = property(lambda self: self.states[0, NORTH])
+    east = property(lambda self: self.states[0, EAST])
+    yaw_angle = property(lambda self: self.states[0, YAW])
+    forward_speed = property(lambda self: self.states[0, SURGE])
+    sideways_speed = property(lambda self: self.states[0, SWAY])
+    yaw_rate = property(lambda self: self.states[0, YAW_RATE])
+
+    def update_differentials(self):
+        self.derivatives = drift_derivatives(self.states, self.params)
+
+    def integrate_differentials(self):
+        self.states = self.states + self.int.dt * self.derivatives
+
+    def store_simulation_data(self):
+        pass
+
+
+# Dormand-Prince 5(4) Butcher tableau
+_DP_NODES = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1, 1])
+_DP_COEFFICIENTS = [
+    [],
+    [1 / 5],
+    [3 / 40, 9 / 40],
+    [44 / 45, -56 / 15, 32 / 9],
+    [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729],
+    [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656],
+    [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+]
+_DP_WEIGHTS = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+_DP_ERROR_WEIGHTS = _DP_WEIGHTS - np.array([5179 / 57600, 0, 7571 / 16695, 393 / 640,
+                                            -92097 / 339200, 187 / 2100, 1 / 40])
+
+
+class AdaptiveIntegrationSettings(NamedTuple):
+    relative_tolerance: float = 1e-6
+    absolute_tolerance: float = 1e-6
+    initial_step: float = 1.0
+    max_step: float = 30.0
+    grounding_time_tolerance: float = 1e-3
+
+
+class AdaptiveIntegrationResult(NamedTuple):
+    time_to_grounding: float
+    grounded: bool
+    number_of_steps: int
+    number_of_rejected_steps: int
+    final_states: np.ndarray
+
+
+def adaptive_time_to_grounding(initial_states, shoreline_index, max_simulation_time: float,
+                               params: DriftModelParameters,
+                               settings: AdaptiveIntegrationSettings = AdaptiveIntegrationSettings()
+                               ) -> AdaptiveIntegrationResult:
+    ''' Drift a single ship from the given initial states (MotionStateInput or array of six
+        states) with an adaptive Dormand-Prince 5(4) integrator, and locate the time
+        at which it first comes within the grounding distance of the shoreline.
+
+        Positions are integrated relative to the initial position so that the error
+        tolerances apply to the distance travelled rather than to the chart coordinates.
+        After each accepted step, the trajectory is interpolated with cubic Hermite
+        polynomials and bisected until the grounding time is known to within
+        `grounding_time_tolerance`. A step is only bisected when its end points are
+        too close to the shoreline to rule out that the chord between them passes
+        within the grounding distance.
+
+        returns:
+        - result (AdaptiveIntegrationResult): If the ship does not ground, the time to
+        grounding is `max_simulation_time`.
+    '''
+    states = np.array(initial_states, dtype=float).reshape(1, 6)
+    origin = states[0, [NORTH, EAST]].copy()
+    states[0, [NORTH, EAST]] = 0.0
+
+    def clearance_at(position):
+        return shoreline_index.grounding_clearance(north=origin[0] + position[0], east=origin[1] + position[1],
+                                                   grounding_distance=GROUNDING_DISTANCE_M)
+
+    checked_position = np.zeros(2)
+    checked_clearance = clearance_at(checked_position)
+    if checked_clearance <= 0:
+        return AdaptiveIntegrationResult(0.0, True, 0, 0, _absolute_states(states[0], origin))
+
+    time = 0.0
+    step = min(settings.initial_step, settings.max_step)
+    derivatives = drift_derivatives(states, params)
+    number_of_steps = 0
+    number_of_rejected_steps = 0
+    while time < max_simulation_time:
+        step = min(step, max_simulation_time - time)
+        stages = [derivatives]
+        for node_coefficients in _DP_COEFFICIENTS[1:]:
+            stage_states = states + step * sum(a * k for a, k in zip(node_coefficients, stages) if a != 0)
+            stages.append(drift_derivatives(stage_states, params))
+        new_states = states + step * sum(b * k for b, k in zip(_DP_WEIGHTS, stages) if b != 0)
+        error = step * sum(e * k for e, k in zip(_DP_ERROR_WEIGHTS, stages) if e != 0)
+        scale = settings.absolute_tolerance \
+            + settings.relative_tolerance * np.maximum(np.abs(states), np.abs(new_states))
+        error_norm = float(np.sqrt(np.mean((error / scale) ** 2)))
+        if error_norm > 1:
+            number_of_rejected_steps += 1
+            step = step * max(0.2, 0.9 * error_norm ** (-1 / 5))
+            continue
+
+        number_of_steps += 1
+        new_derivatives = stages[-1]
+        new_position = new_states[0, [NORTH, EAST]]
+        if np.hypot(*(new_position - checked_position)) >= checked_clearance:
+            position_at = _hermite_position(time, states[0], derivatives[0], time + step,
+                                            new_states[0], new_derivatives[0])
+            start_clearance = checked_clearance - np.hypot(*(states[0, [NORTH, EAST]] - checked_position))
+            new_clearance = clearance_at(new_position)
+            grounding_time = _earliest_grounding(time, start_clearance, time + step, new_clearance,
+                                                 position_at, clearance_at, settings.grounding_time_tolerance)
+            if grounding_time is not None:
+                grounding_states = _hermite_states(time, states[0], derivatives[0], time + step,
+                                                   new_states[0], new_derivatives[0])(grounding_time)
+                return AdaptiveIntegrationResult(grounding_time, True, number_of_steps, number_of_rejected_steps,
+                                                 _absolute_states(grounding_states, origin))
+            checked_position = new_position.copy()
+            checked_clearance = new_clearance
+
+        time = time + step
+        states = new_states
+        derivatives = new_derivatives
+        step = min(step * min(5.0, 0.9 * max(error_norm, 1e-10) ** (-1 / 5)), settings.max_step)
+    return AdaptiveIntegrationResult(max_simulation_time, False, number_of_steps, number_of_rejected_steps,
+                                     _absolute_states(states[0], origin))
+
+
+def _absolute_states(states, origin):
+    states = states.copy()
+    states[[NORTH, EAST]] += origin
+    return states
+
+
+def _hermite_position(start_time, start_states, start_derivatives, end_time, end_states, end_derivatives):
+    ''' Cubic Hermite interpolation of the north and east positions over one step.
+    '''
+    columns = [NORTH, EAST]
+    return _hermite_states(start_time, start_states[columns], start_derivatives[columns],
+                           end_time, end_states[columns], end_derivatives[columns])
+
+
+def _hermite_states(start_time, start_states, start_derivatives, end_time, end_states, end_derivatives):
+    ''' Cubic Hermite interpolation of the states over one step.
+    '''
+    step = end_time - start_time
+    start_slope = start_derivatives * step
+    end_slope = end_derivatives * step
+
+    def states_at(time):
+        s = (time - start_time) / step
+        return (2 * s ** 3 - 3 * s ** 2 + 1) * start_states + (s ** 3 - 2 * s ** 2 + s) * start_slope \
+            + (-2 * s ** 3 + 3 * s ** 2) * end_states + (s ** 3 - s ** 2) * end_slope
+    return states_at
+
+
+def _earliest_grounding(start_time, start_clearance, end_time, end_clearance, position_at, clearance_at,
+                        time_tolerance):
+    ''' Earliest time in (start_time, end_time] at which the interpolated trajectory is
+        within the grounding distance, or None. `start_clearance` is positive and may be
+        a lower bound on the clearance at `start_time`.
+
+        If a point on the chord between the end points were within the grounding
+        distance, the chord would be at least as long as the sum of the clearances
+        at its ends, so intervals with a shorter chord are not searched further.
+    '''
+    chord = np.hypot(*(position_at(end_time) - position_at(start_time)))
+    if end_clearance > 0 and chord < start_clearance + end_clearance:
+        return None
+    if end_time - start_time <= time_tolerance:
+        return end_time if end_clearance <= 0 else None
+    middle_time = 0.5 * (start_time + end_time)
+    middle_clearance = clearance_at(position_at(middle_time))
+    if middle_clearance > 0:
+        grounding_time = _earliest_grounding(start_time, start_clearance, middle_time, middle_clearance,
+                                             position_at, clearance_at, time_tolerance)
+        if grounding_time is not None:
+            return grounding_time
+        return _earliest_grounding(middle_time, middle_clearance, end_time, end_clearance,
+                                   position_at, clearance_at, time_tolerance)
+    return _earliest_grounding(start_time, start_clearance, middle_time, middle_clearance,
+                               position_at, clearance_at, time_tolerance)
+
+
+def reference_model_deviation(ship_config, simulation_config, environment_config,
+                              number_of_steps: int = 1000) -> np.ndarray:
+    ''' Integrate a single ship with both ShipModelWithoutPropulsion and drift_derivatives
+        for the given number of steps, and return the largest absolute difference of each
+        of the six states. Requires ship_in_transit_simulator.
+    '''
+    from ship_in_transit_simulator.models import ShipModelWithoutPropulsion
+
+    reference = ShipModelWithoutPropulsion(ship_config=ship_config,
+                                           environment_config=environment_config,
+                                           simulation_config=simulation_config)
+    params = drift_model_parameters(ship_config, environment_config)
+    states = np.array([[simulation_config.initial_north_position_m,
+                        simulation_config.initial_east_position_m,
+                        simulation_config.initial_yaw_angle_rad,
+                        simulation_config.initial_forward_speed_m_per_s,
+                        simulation_config.initial_sideways_speed_m_per_s,
+                        simulation_config.initial_yaw_rate_rad_per_s]])
+    deviation = np.zeros(6)
+    for _ in range(number_of_steps):
+        reference.update_differentials()
+        reference.integrate_differentials()
+        reference.int.next_time()
+        states += simulation_config.integration_step * drift_derivatives(states, params)
+        reference_states = np.array([reference.north, reference.east, reference.yaw_angle,
+                                     reference.forward_speed, reference.sideways_speed, reference.yaw_rate])
+        deviation = np.maximum(deviation, np.abs(states[0] - reference_states))
+    return deviation
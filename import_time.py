@@ -0,0 +1,40 @@
+"""
+    Measures the time to import the core modules (risk_core, drift_model and scenarios)
+    in a fresh interpreter, and which of the heavy optional dependencies they load. Used
+    by benchmarks.py and test_import_time.py, and has no side effects on import.
+"""
+import json
+import os
+import subprocess
+import sys
+from typing import List, Sequence, Tuple
+
+CORE_MODULES = ['risk_core', 'drift_model', 'scenarios']
+CORE_EXCLUDED_MODULES = ['scipy', 'shapely', 'ship_in_transit_simulator', 'tkinter', 'xmlrpc', 'pandas', 'matplotlib']
+IMPORT_TIME_BUDGET_MS = 500.0
+IMPORT_TIME_SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import {modules}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'loaded': sorted({{name.split('.')[0] for name in sys.modules}})}}))
+"""
+
+
+def measure_import_time(modules: Sequence[str] = CORE_MODULES, repeats: int = 1) -> Tuple[float, List[str]]:
+    ''' Import the modules in `repeats` fresh interpreters started in this directory.
+
+        returns:
+        - import_time_ms (float): Shortest time to import the modules, excluding the start
+        of the interpreter itself.
+        - excluded_modules_loaded (list): The modules of CORE_EXCLUDED_MODULES loaded by
+        the import.
+    '''
+    script = IMPORT_TIME_SCRIPT.format(modules=', '.join(modules))
+    measurements = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                capture_output=True, text=True, check=True).stdout
+        measurements.append(json.loads(output))
+    excluded_modules_loaded = sorted(set(CORE_EXCLUDED_MODULES) & set(measurements[0]['loaded']))
+    return 1e3 * min(measurement['seconds'] for measurement in measurements), excluded_modules_loaded
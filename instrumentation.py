@@ -0,0 +1,122 @@
+"""
+    Provides optional instrumentation of the risk model: wall time per phase, counts of
+    integration steps and shoreline queries, and the reasons drift simulations end
+    early. Instrumented classes take an `instrumentation` argument that defaults to None,
+    in which case nothing is measured.
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Callable, Dict, NamedTuple
+
+INTEGRATION = 'integration'
+SHORELINE_QUERY = 'shoreline query'
+RECORDING = 'recording'
+SCENARIO_CONSTRUCTION = 'scenario construction'
+SCENARIO_PROBABILITY = 'scenario probability'
+
+INTEGRATION_STEPS = 'integration steps'
+REJECTED_INTEGRATION_STEPS = 'rejected integration steps'
+SHORELINE_QUERIES = 'shoreline queries'
+SCENARIO_EVALUATIONS = 'scenario evaluations'
+
+GROUNDED = 'grounded'
+MAX_SIMULATION_TIME_REACHED = 'max simulation time reached'
+SHORELINE_OUT_OF_REACH = 'shoreline out of reach'
+CACHE_HIT = 'cache hit'
+
+
+class InstrumentationStatistics(NamedTuple):
+    phase_times_s: Dict[str, float]
+    counts: Dict[str, int]
+    early_exit_reasons: Dict[str, int]
+
+
+class Instrumentation:
+    ''' Collects wall time per phase, counts and early exit reasons. If a callback is
+        given, it is called with (kind, name, value) for every measurement, where kind is
+        'phase' (value in seconds), 'count' or 'early exit' (value 1).
+
+        Instrumented code adds up its measurements locally and reports them once per drift
+        simulation or scenario evaluation, so the callback is never called from inside the
+        integration loop.
+    '''
+
+    def __init__(self, callback: Callable[[str, str, float], None] = None):
+        self.callback = callback
+        self.phase_times_s = Counter()
+        self.counts = Counter()
+        self.early_exit_reasons = Counter()
+
+    def add_phase_time(self, phase: str, seconds: float):
+        self.phase_times_s[phase] += seconds
+        if self.callback is not None:
+            self.callback('phase', phase, seconds)
+
+    def count(self, name: str, number: int = 1):
+        self.counts[name] += number
+        if self.callback is not None:
+            self.callback('count', name, number)
+
+    def early_exit(self, reason: str):
+        self.early_exit_reasons[reason] += 1
+        if self.callback is not None:
+            self.callback('early exit', reason, 1)
+
+    @contextmanager
+    def phase(self, phase: str):
+        ''' Time the body of a with-statement as `phase`.
+        '''
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(phase, time.perf_counter() - start)
+
+    @property
+    def statistics(self) -> InstrumentationStatistics:
+        return InstrumentationStatistics(phase_times_s=dict(self.phase_times_s),
+                                         counts=dict(self.counts),
+                                         early_exit_reasons=dict(self.early_exit_reasons))
+
+    def reset(self):
+        self.phase_times_s.clear()
+        self.counts.clear()
+        self.early_exit_reasons.clear()
+
+
+class CountingShorelineIndex:
+    ''' Wraps a ShorelineIndex or DistanceRaster, counting and timing the point queries
+        made through it. Other attributes are passed through to the wrapped index.
+    '''
+
+    def __init__(self, shoreline_index):
+        self.shoreline_index = shoreline_index
+        self.number_of_queries = 0
+        self.query_time_s = 0.0
+
+    def __getattr__(self, name):
+        return getattr(self.shoreline_index, name)
+
+    def grounding_clearance(self, north: float, east: float, grounding_distance: float) -> float:
+        start = time.perf_counter()
+        clearance = self.shoreline_index.grounding_clearance(north=north, east=east,
+                                                             grounding_distance=grounding_distance)
+        self.query_time_s += time.perf_counter() - start
+        self.number_of_queries += 1
+        return clearance
+
+    def is_grounded(self, north: float, east: float, grounding_distance: float) -> bool:
+        start = time.perf_counter()
+        grounded = self.shoreline_index.is_grounded(north=north, east=east, grounding_distance=grounding_distance)
+        self.query_time_s += time.perf_counter() - start
+        self.number_of_queries += 1
+        return grounded
+
+    def report(self, instrumentation: Instrumentation):
+        ''' Add the queries made so far to `instrumentation` and start counting from zero.
+        '''
+        instrumentation.add_phase_time(SHORELINE_QUERY, self.query_time_s)
+        instrumentation.count(SHORELINE_QUERIES, self.number_of_queries)
+        self.number_of_queries = 0
+        self.query_time_s = 0.0
@@ -0,0 +1,164 @@
+"""
+    Provides a rolling prediction horizon along the own-ship's predicted route: the
+    conditional probability of grounding is found for each risk time interval by drifting
+    the ship from its predicted state at the start of the interval, and results are kept
+    for the intervals that are still in the horizon when it advances.
+"""
+from typing import Dict, NamedTuple, Sequence, Tuple
+
+import numpy as np
+
+from consequences import ShoreCharacterIndex
+from drift_model import BatchTimeToGroundingSimulator, DriftModelParameters, NORTH, EAST, YAW, SURGE, \
+    speeds_over_ground
+from risk_core import AccumulatedRiskInPredictionHorizon, CompiledLossOfMainEngineScenario, \
+    RiskModelConfiguration, ScenarioAnalysisParameters
+
+
+class PredictedRoute(NamedTuple):
+    ''' Predicted states of the own-ship (array of shape (M, 6), columns ordered as
+        MotionStateInput) at non-decreasing times in seconds. Two states at the same time
+        give a sudden change, such as the change of heading at a waypoint.
+    '''
+    times: np.ndarray
+    states: np.ndarray
+
+    @classmethod
+    def from_waypoints(cls, waypoints: Sequence[Tuple[float, float]], speed: float,
+                       start_time: float = 0.0) -> 'PredictedRoute':
+        ''' Route following straight legs between (north, east) waypoints at constant
+            forward speed. Each leg has a state at its start and at its end, both with the
+            heading of the leg, so the heading is constant along each leg and changes at
+            the waypoints, where consecutive legs share the same time.
+        '''
+        waypoints = np.asarray(waypoints, dtype=float)
+        legs = np.diff(waypoints, axis=0)
+        leg_durations = np.hypot(legs[:, 0], legs[:, 1]) / speed
+        headings = np.arctan2(legs[:, 1], legs[:, 0])
+        waypoint_times = start_time + np.concatenate(([0.0], np.cumsum(leg_durations)))
+        states = np.zeros((2 * len(legs), 6))
+        states[0::2, [NORTH, EAST]] = waypoints[:-1]
+        states[1::2, [NORTH, EAST]] = waypoints[1:]
+        states[:, YAW] = np.repeat(headings, 2)
+        states[:, SURGE] = speed
+        times = np.column_stack([waypoint_times[:-1], waypoint_times[1:]]).ravel()
+        return cls(times=times, states=states)
+
+    def states_at(self, times: np.ndarray) -> np.ndarray:
+        ''' Linearly interpolated states at the given times. Headings are unwrapped
+            before interpolating, and the states are held constant outside the route.
+        '''
+        states = self.states.copy()
+        states[:, YAW] = np.unwrap(states[:, YAW])
+        return np.column_stack([np.interp(times, self.times, states[:, column]) for column in range(6)])
+
+
+class RollingPredictionHorizon:
+    ''' Grounding risk for a prediction horizon of adjoining risk time intervals along a
+        predicted route.
+
+        The drift simulations for all intervals missing a result are run together in one
+        BatchTimeToGroundingSimulator on the shared shoreline index. Times to grounding
+        are stored per interval, so when the horizon is advanced only the intervals that
+        enter the horizon are simulated.
+    '''
+
+    def __init__(self, route: PredictedRoute,
+                 shoreline_index,
+                 risk_model_config: RiskModelConfiguration,
+                 params: DriftModelParameters,
+                 scenario_params: ScenarioAnalysisParameters,
+                 number_of_intervals: int,
+                 integration_step: float = 0.5,
+                 consequence_of_grounding: float = 1.0,
+                 start_time: float = 0.0,
+                 consequence_index: ShoreCharacterIndex = None):
+        ''' Set up the horizon.
+
+            args:
+            - route (PredictedRoute): Predicted states of the own-ship.
+            - shoreline_index (ShorelineIndex or DistanceRaster): Index over the shoreline.
+            - params (DriftModelParameters): Drift model parameters (see drift_model).
+            - number_of_intervals (int): Number of risk time intervals in the horizon.
+            - consequence_of_grounding (float): Consequence used for each time interval.
+            - start_time (float): Start time of the first interval, on the route's time scale.
+            - consequence_index (ShoreCharacterIndex): If given, the consequence for each time
+            interval is found from the impact speed and the shore character where the ship
+            drifting from that interval grounds, instead of using `consequence_of_grounding`.
+        '''
+        self.route = route
+        self.shoreline_index = shoreline_index
+        self.max_drift_time = risk_model_config.max_drift_time_s
+        self.risk_time_interval = risk_model_config.risk_time_interval
+        self.params = params
+        self.number_of_intervals = number_of_intervals
+        self.integration_step = integration_step
+        self.consequence_of_grounding = consequence_of_grounding
+        self.start_time = start_time
+        self.consequence_index = consequence_index
+        self.first_interval = 0
+        self.scenario = CompiledLossOfMainEngineScenario(risk_time_interval=self.risk_time_interval,
+                                                         scenario_parameters=scenario_params)
+        self._time_to_grounding: Dict[int, float] = {}
+        self._consequence: Dict[int, float] = {}
+        self.number_of_simulated_intervals = 0
+
+    @property
+    def interval_indices(self) -> np.ndarray:
+        return np.arange(self.first_interval, self.first_interval + self.number_of_intervals)
+
+    @property
+    def interval_start_times(self) -> np.ndarray:
+        return self.start_time + self.interval_indices * self.risk_time_interval
+
+    def advance(self, number_of_intervals: int = 1):
+        ''' Move the horizon forward, forgetting the intervals that leave it.
+        '''
+        self.first_interval += number_of_intervals
+        for index in [index for index in self._time_to_grounding if index < self.first_interval]:
+            del self._time_to_grounding[index]
+            self._consequence.pop(index, None)
+
+    def update_route(self, route: PredictedRoute):
+        ''' Replace the predicted route. All stored results are discarded.
+        '''
+        self.route = route
+        self._time_to_grounding.clear()
+        self._consequence.clear()
+
+    def times_to_grounding(self) -> np.ndarray:
+        ''' Time to grounding when drifting from the start of each interval in the horizon.
+        '''
+        missing = [index for index in self.interval_indices if index not in self._time_to_grounding]
+        if missing:
+            missing = np.array(missing)
+            initial_states = self.route.states_at(self.start_time + missing * self.risk_time_interval)
+            simulator = BatchTimeToGroundingSimulator(
+                initial_states=initial_states,
+                shoreline_index=self.shoreline_index,
+                max_simulation_time=self.max_drift_time,
+                integration_step=self.integration_step,
+                params=self.params
+            )
+            simulated_times = simulator.time_to_grounding()
+            self._time_to_grounding.update(zip(missing.tolist(), simulated_times.tolist()))
+            if self.consequence_index is not None:
+                consequences = self.consequence_index.consequences(
+                    north=simulator.states[:, NORTH],
+                    east=simulator.states[:, EAST],
+                    impact_speed=speeds_over_ground(simulator.states, self.params),
+                    grounded=simulator.grounded
+                )
+                self._consequence.update(zip(missing.tolist(), consequences.tolist()))
+            self.number_of_simulated_intervals += len(missing)
+        return np.array([self._time_to_grounding[index] for index in self.interval_indices])
+
+    def accumulated_risk(self) -> AccumulatedRiskInPredictionHorizon:
+        ''' Accumulated probability and risk of grounding over the horizon.
+        '''
+        conditional_probabilities = self.scenario.scenario_probabilities(self.times_to_grounding())
+        if self.consequence_index is None:
+            consequences = np.full(self.number_of_intervals, float(self.consequence_of_grounding))
+        else:
+            consequences = np.array([self._consequence[index] for index in self.interval_indices])
+        return AccumulatedRiskInPredictionHorizon(conditional_probabilities, consequences)
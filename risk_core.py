@@ -0,0 +1,212 @@
+"""
+    Core of the grounding risk calculations: the model inputs, the probability of grounding
+    for arrays of available recovery times and the accumulated risk in a prediction
+    horizon. Together with drift_model, this only imports NumPy (scipy is loaded on first
+    use of the scenario probabilities), so worker processes that only need the risk math
+    and the drift loop can import these modules instead of risk_model, which also loads
+    shapely and ship_in_transit_simulator. The classes are re-exported by risk_model.
+"""
+import time
+from typing import List, NamedTuple
+
+import numpy as np
+
+import scenarios
+from instrumentation import SCENARIO_EVALUATIONS, SCENARIO_PROBABILITY, Instrumentation
+
+
+class MotionStateInput(NamedTuple):
+    north_position: float
+    east_position: float
+    yaw_angle_rad: float
+    surge_speed: float
+    sway_speed: float
+    yaw_rate: float
+
+
+class RiskModelConfiguration(NamedTuple):
+    max_drift_time_s: float
+    risk_time_interval: float
+
+
+class ScenarioAnalysisParameters(NamedTuple):
+    main_engine_failure_rate: float
+    main_engine_mean_restart_time: float
+    main_engine_restart_time_std: float
+    main_engine_restart_time_shift: float
+    main_engine_nominal_restart_prob: float
+
+
+class CompiledLossOfMainEngineScenario:
+    ''' Array form of risk_model.LossOfMainEngineScenario. The probability of losing the main engine
+        only depends on the scenario parameters and the risk time interval, so it is
+        calculated once, and the probability of grounding is then evaluated for a whole
+        array of available recovery times in one vectorized call.
+    '''
+
+    def __init__(self, risk_time_interval: float, scenario_parameters: ScenarioAnalysisParameters,
+                 instrumentation: Instrumentation = None) -> None:
+        self.instrumentation = instrumentation
+        self.scenario_params = scenario_parameters
+        self.risk_time_interval = risk_time_interval
+        self.probability_of_loss = scenarios.TriggeringEvent(
+            rate_of_occurrence=scenario_parameters.main_engine_failure_rate,
+            time_interval=risk_time_interval
+        ).probability
+        self.restart_main_engine_params = scenarios.StartUpEventParameters(
+            mean_time_to_restart_s=scenario_parameters.main_engine_mean_restart_time,
+            standard_deviation_time_to_restart=scenario_parameters.main_engine_restart_time_std,
+            time_shift_time_to_restart=scenario_parameters.main_engine_restart_time_shift,
+            nominal_success_probability=scenario_parameters.main_engine_nominal_restart_prob
+        )
+
+    def scenario_probabilities(self, available_recovery_times: np.ndarray) -> np.ndarray:
+        ''' Probability of grounding for each available recovery time, equal to
+            LossOfMainEngineScenario(...).scenario_probabilities() for each time.
+        '''
+        if self.instrumentation is not None:
+            start = time.perf_counter()
+        probability_of_restoration = scenarios.startup_success_probabilities(
+            parameters=self.restart_main_engine_params,
+            times_available=available_recovery_times
+        )
+        probability_of_no_grounding = 1 - (1 - probability_of_restoration) * self.probability_of_loss
+        if self.instrumentation is not None:
+            self.instrumentation.add_phase_time(SCENARIO_PROBABILITY, time.perf_counter() - start)
+            self.instrumentation.count(SCENARIO_EVALUATIONS, np.size(available_recovery_times))
+        return 1 - probability_of_no_grounding
+
+
+class AccumulatedRiskInPredictionHorizon:
+    ''' Find the probability of an event occurring during a prediction horizon (consisting
+        of a set of small adjoining time intervals.
+
+        It is assumed that the event can occur only one time per prediction horizon.
+    '''
+
+    def __init__(self, conditional_probabilities_for_each_time_interval: List[float],
+                 consequence_of_accident_for_each_time_step: List[float]):
+        ''' For each small adjoining time interval, calculate:
+            - the unconditional probability of the event occurring for each time interval
+            - the unconditional risk ('probability of occurrence' times 'consequence of occurrence')
+            - the accumulated (cumulative) probability of the event having occurred in any of the
+            preceding time intervals after each time interval
+            - the accumulated risk so far in the prediction horizon after each time interval (i.e.
+            the cumulative distribution)
+
+            The results are NumPy arrays. More time intervals can be added to the end of the
+            horizon with `append` or `extend` without recalculating the preceding ones.
+        '''
+        self._number_of_intervals = 0
+        self._unconditional_probabilities = np.empty(0)
+        self._unconditional_risks = np.empty(0)
+        self._accumulated_probabilities = np.empty(0)
+        self._accumulated_risks = np.empty(0)
+        self.accumulated_probability = 0.0
+        self.accumulated_risk = 0.0
+        self.extend(conditional_probabilities_for_each_time_interval, consequence_of_accident_for_each_time_step)
+
+    @property
+    def unconditional_probability_for_each_time_interval(self) -> np.ndarray:
+        return self._unconditional_probabilities[:self._number_of_intervals]
+
+    @property
+    def unconditional_risk_at_each_time_interval(self) -> np.ndarray:
+        return self._unconditional_risks[:self._number_of_intervals]
+
+    @property
+    def accumulated_probability_after_each_time_interval(self) -> np.ndarray:
+        return self._accumulated_probabilities[:self._number_of_intervals]
+
+    @property
+    def accumulated_risk_after_each_time_interval(self) -> np.ndarray:
+        return self._accumulated_risks[:self._number_of_intervals]
+
+    def append(self, cond_prob: float, consequence: float):
+        ''' Add one time interval to the end of the prediction horizon, updating the
+            accumulated probability and risk in constant (amortized) time.
+        '''
+        self._reserve(self._number_of_intervals + 1)
+        unconditional_probability = self.unconditional_probability_at_time_step(
+            conditional_probability_this_time_step=cond_prob,
+            probability_of_event_having_occurred=self.accumulated_probability
+        )
+        unconditional_risk = self.unconditional_risk_each_time_step(
+            unconditional_probability_this_time_step=unconditional_probability,
+            consequence_this_time_step=consequence
+        )
+        self.accumulated_probability += unconditional_probability
+        self.accumulated_risk += unconditional_risk
+        i = self._number_of_intervals
+        self._unconditional_probabilities[i] = unconditional_probability
+        self._unconditional_risks[i] = unconditional_risk
+        self._accumulated_probabilities[i] = self.accumulated_probability
+        self._accumulated_risks[i] = self.accumulated_risk
+        self._number_of_intervals += 1
+
+    def extend(self, conditional_probabilities: List[float], consequences: List[float]):
+        ''' Add several time intervals to the end of the prediction horizon using
+            cumulative array operations.
+
+            The probability that the event has not occurred before an interval is the
+            product of the conditional probabilities of it not occurring in each of the
+            preceding intervals.
+        '''
+        number_of_new_intervals = min(len(conditional_probabilities), len(consequences))
+        conditional_probabilities = np.asarray(conditional_probabilities, dtype=float)[:number_of_new_intervals]
+        consequences = np.asarray(consequences, dtype=float)[:number_of_new_intervals]
+        if number_of_new_intervals == 0:
+            return
+        probability_of_event_not_occurred = (1 - self.accumulated_probability) * np.cumprod(
+            np.concatenate(([1.0], 1 - conditional_probabilities[:-1])))
+        unconditional_probabilities = self.unconditional_probability_at_time_step(
+            conditional_probability_this_time_step=conditional_probabilities,
+            probability_of_event_having_occurred=1 - probability_of_event_not_occurred
+        )
+        unconditional_risks = self.unconditional_risk_each_time_step(
+            unconditional_probability_this_time_step=unconditional_probabilities,
+            consequence_this_time_step=consequences
+        )
+        start = self._number_of_intervals
+        end = start + number_of_new_intervals
+        self._reserve(end)
+        self._unconditional_probabilities[start:end] = unconditional_probabilities
+        self._unconditional_risks[start:end] = unconditional_risks
+        self._accumulated_probabilities[start:end] = self.accumulated_probability + np.cumsum(unconditional_probabilities)
+        self._accumulated_risks[start:end] = self.accumulated_risk + np.cumsum(unconditional_risks)
+        self.accumulated_probability = float(self._accumulated_probabilities[end - 1])
+        self.accumulated_risk = float(self._accumulated_risks[end - 1])
+        self._number_of_intervals = end
+
+    def _reserve(self, number_of_intervals: int):
+        ''' Grow the result arrays geometrically so that appending is amortized constant time.
+        '''
+        capacity = len(self._unconditional_probabilities)
+        if number_of_intervals <= capacity:
+            return
+        new_capacity = max(number_of_intervals, 2 * capacity, 16)
+        for name in ('_unconditional_probabilities', '_unconditional_risks',
+                     '_accumulated_probabilities', '_accumulated_risks'):
+            grown = np.empty(new_capacity)
+            grown[:capacity] = getattr(self, name)
+            setattr(self, name, grown)
+
+    @staticmethod
+    def unconditional_probability_at_time_step(conditional_probability_this_time_step: float,
+                                               probability_of_event_having_occurred: float):
+        """ The unconditional probability accounts for the possibility that the
+            event might have occurred already. Thus, the further out in the prediction
+            horizon, the smaller the unconditional probability will be (i.e. if it is
+            almost certain that the event has already occurred, and it can only occur
+            once, it is almost certain not to occur now).
+        """
+        return conditional_probability_this_time_step * (1 - probability_of_event_having_occurred)
+
+    @staticmethod
+    def unconditional_risk_each_time_step(unconditional_probability_this_time_step: float,
+                                          consequence_this_time_step: float):
+        ''' The unconditional risk for a given time step is the probability of an accident at
+            the given time step times the price (consequence) of the accident if it occurs at
+            the given time step.
+        '''
+        return unconditional_probability_this_time_step * consequence_this_time_step
@@ -0,0 +1,118 @@
+"""
+    Provides grounding risk maps: the time to grounding and probability of grounding for
+    ships on a grid of positions, headings and speeds in a chart region, computed in
+    parallel worker processes.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+from drift_model import DriftModelParameters, drift_model_parameters, screened_times_to_grounding
+from risk_core import CompiledLossOfMainEngineScenario, RiskModelConfiguration, ScenarioAnalysisParameters
+from shoreline import ShorelineIndex
+
+
+class RiskMapConfiguration(NamedTuple):
+    region: Tuple[float, float, float, float]
+    grid_spacing: float
+    headings_rad: Sequence[float]
+    speeds: Sequence[float]
+    integration_step: float = 0.5
+
+
+class RiskMap(NamedTuple):
+    ''' Results indexed as [north, east, heading, speed].
+    '''
+    north_positions: np.ndarray
+    east_positions: np.ndarray
+    headings_rad: np.ndarray
+    speeds: np.ndarray
+    time_to_grounding: np.ndarray
+    probability_of_grounding: np.ndarray
+
+
+def grounding_risk_map(shoreline, map_config: RiskMapConfiguration,
+                       risk_model_config: RiskModelConfiguration,
+                       ship_config, environment_config,
+                       scenario_params: ScenarioAnalysisParameters,
+                       number_of_workers: int = None,
+                       cells_per_task: int = 256) -> RiskMap:
+    ''' Calculate the time to grounding and the probability of grounding for ships
+        starting at every grid cell in the region, with each combination of heading
+        and forward speed.
+
+        args:
+        - shoreline: Shoreline (multi)polygon.
+        - map_config (RiskMapConfiguration): The region is (min_east, min_north, max_east,
+        max_north), and grid cells are spaced `grid_spacing` meters apart.
+        - ship_config, environment_config: ShipConfiguration and EnvironmentConfiguration
+        of ship_in_transit_simulator.
+        - number_of_workers (int): Number of worker processes. Defaults to the number of
+        CPUs. With one worker, the map is calculated in this process.
+        - cells_per_task (int): Number of ships drifted together in each task sent to
+        the workers.
+
+        The shoreline is sent to each worker once, when it starts, and each worker builds
+        its own shoreline index. Tasks only contain initial states and return times to
+        grounding, which are drifted in lockstep with BatchTimeToGroundingSimulator.
+        Ships that cannot reach the shoreline within `max_drift_time_s` are not
+        simulated, as in GroundingRiskModel.
+    '''
+    min_east, min_north, max_east, max_north = map_config.region
+    north_positions = np.arange(min_north, max_north + 0.5 * map_config.grid_spacing, map_config.grid_spacing)
+    east_positions = np.arange(min_east, max_east + 0.5 * map_config.grid_spacing, map_config.grid_spacing)
+    headings = np.asarray(map_config.headings_rad, dtype=float)
+    speeds = np.asarray(map_config.speeds, dtype=float)
+    grid = np.meshgrid(north_positions, east_positions, headings, speeds, indexing='ij')
+    map_shape = grid[0].shape
+    initial_states = np.zeros((grid[0].size, 6))
+    initial_states[:, :4] = np.column_stack([dimension.ravel() for dimension in grid])
+
+    params = drift_model_parameters(ship_config, environment_config)
+    worker_setup = (shapely.to_wkb(shoreline), params, risk_model_config.max_drift_time_s,
+                    map_config.integration_step)
+    tasks = [initial_states[start:start + cells_per_task]
+             for start in range(0, len(initial_states), cells_per_task)]
+    if number_of_workers is None:
+        number_of_workers = os.cpu_count() or 1
+    if number_of_workers == 1:
+        _initialize_worker(*worker_setup)
+        results = [_time_to_grounding(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=number_of_workers, initializer=_initialize_worker,
+                                 initargs=worker_setup) as executor:
+            results = list(executor.map(_time_to_grounding, tasks))
+    time_to_grounding = np.concatenate(results).reshape(map_shape)
+
+    scenario = CompiledLossOfMainEngineScenario(risk_time_interval=risk_model_config.risk_time_interval,
+                                                scenario_parameters=scenario_params)
+    return RiskMap(north_positions=north_positions,
+                   east_positions=east_positions,
+                   headings_rad=headings,
+                   speeds=speeds,
+                   time_to_grounding=time_to_grounding,
+                   probability_of_grounding=scenario.scenario_probabilities(time_to_grounding))
+
+
+# Set up once in each worker process by _initialize_worker
+_worker_shoreline_index: ShorelineIndex = None
+_worker_params: DriftModelParameters = None
+_worker_max_drift_time: float = None
+_worker_integration_step: float = None
+
+
+def _initialize_worker(shoreline_wkb: bytes, params: DriftModelParameters, max_drift_time: float,
+                       integration_step: float):
+    global _worker_shoreline_index, _worker_params, _worker_max_drift_time, _worker_integration_step
+    _worker_shoreline_index = ShorelineIndex(shapely.from_wkb(shoreline_wkb))
+    _worker_params = params
+    _worker_max_drift_time = max_drift_time
+    _worker_integration_step = integration_step
+
+
+def _time_to_grounding(initial_states: np.ndarray) -> np.ndarray:
+    return screened_times_to_grounding(initial_states, _worker_shoreline_index, _worker_params,
+                                       _worker_max_drift_time, _worker_integration_step)
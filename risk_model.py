@@ -2,28 +2,50 @@
     Provides classes to estimate drifting grounding risk either for a small time interval or a
     prediction horizon (a set of adjoining small time intervals).
 """
+import math
+import time
+
 import numpy as np
-from tkinter import E
-from typing import NamedTuple, List
+from typing import Any, Callable, Hashable, NamedTuple, List, Tuple
 import shapely.geometry as geo
 
 import scenarios
+from caching import TimeToGroundingCache
+from consequences import GroundingOutcome, ShoreCharacterIndex
+from drift_model import AdaptiveIntegrationSettings, adaptive_time_to_grounding, drift_model_parameters, \
+    max_reachable_distances, screened_times_to_grounding, shoreline_out_of_reach, speeds_over_ground
+from instrumentation import CACHE_HIT, GROUNDED, INTEGRATION, INTEGRATION_STEPS, MAX_SIMULATION_TIME_REACHED, \
+    RECORDING, REJECTED_INTEGRATION_STEPS, SCENARIO_CONSTRUCTION, SHORELINE_OUT_OF_REACH, CountingShorelineIndex, \
+    Instrumentation
+from risk_core import AccumulatedRiskInPredictionHorizon, CompiledLossOfMainEngineScenario, MotionStateInput, \
+    RiskModelConfiguration, ScenarioAnalysisParameters
+from shoreline import ShorelineIndex, GROUNDING_DISTANCE_M, clip_to_reachable_region
 from ship_in_transit_simulator.models import  \
     EnvironmentConfiguration, ShipModelWithoutPropulsion, ShipConfiguration, SimulationConfiguration
 
 
-class MotionStateInput(NamedTuple):
-    north_position: float
-    east_position: float
-    yaw_angle_rad: float
-    surge_speed: float
-    sway_speed: float
-    yaw_rate: float
+NO_RECORDING = 'none'
+DECIMATED_RECORDING = 'decimated'
+FULL_RECORDING = 'full'
+
+TRAJECTORY_DTYPE = np.dtype([
+    ('time [s]', float),
+    ('north position [m]', float),
+    ('east position [m]', float),
+    ('yaw angle [deg]', float),
+    ('forward speed [m/s]', float),
+    ('sideways speed [m/s]', float),
+    ('yaw rate [deg/sec]', float),
+])
 
 
-class RiskModelConfiguration(NamedTuple):
-    max_drift_time_s: float
-    risk_time_interval: float
+class TrajectoryRecordingConfiguration(NamedTuple):
+    ''' How much of the drift trajectory TimeToGroundingSimulator records: nothing
+        (NO_RECORDING), one sample every `decimation_interval_s` seconds
+        (DECIMATED_RECORDING) or every integration step (FULL_RECORDING).
+    '''
+    mode: str = FULL_RECORDING
+    decimation_interval_s: float = 20.0
 
 
 class ShipPose:
@@ -33,12 +55,21 @@ class ShipPose:
         self.heading_deg = heading_deg
 
 
-class ScenarioAnalysisParameters(NamedTuple):
-    main_engine_failure_rate: float
-    main_engine_mean_restart_time: float
-    main_engine_restart_time_std: float
-    main_engine_restart_time_shift: float
-    main_engine_nominal_restart_prob: float
+class EnvironmentUncertainty(NamedTuple):
+    ''' Distributions of the environmental conditions, as objects with an
+        `rvs(size, random_state)` method such as frozen scipy.stats distributions. Fields
+        left as None keep the value from the EnvironmentConfiguration.
+    '''
+    wind_speed: Any = None
+    wind_direction: Any = None
+    current_velocity_component_from_north: Any = None
+    current_velocity_component_from_east: Any = None
+
+
+class MonteCarloResult(NamedTuple):
+    mean_probability_of_grounding: float
+    confidence_interval: Tuple[float, float]
+    number_of_samples: int
 
 
 class GroundingRiskModel:
@@ -47,39 +78,236 @@ class GroundingRiskModel:
                  sim_config: SimulationConfiguration,
                  env_config: EnvironmentConfiguration,
                  environment: geo.multipolygon.MultiPolygon,
-                 scenario_params: ScenarioAnalysisParameters):
+                 scenario_params: ScenarioAnalysisParameters,
+                 shoreline_index: ShorelineIndex = None,
+                 use_reachability_prescreen: bool = True,
+                 adaptive_integration: AdaptiveIntegrationSettings = None,
+                 trajectory_recording: TrajectoryRecordingConfiguration = TrajectoryRecordingConfiguration(),
+                 ttg_cache: TimeToGroundingCache = None,
+                 chart_id: Hashable = None,
+                 clip_shoreline_to_reach: bool = False,
+                 instrumentation: Instrumentation = None,
+                 consequence_index: ShoreCharacterIndex = None):
+        ''' Set up the time to grounding simulation. The drift simulation is not run until
+            the time to grounding or the risk is first needed, and is run at most once.
+            Use `evaluate_scenarios` to evaluate other scenario parameters against the same
+            time to grounding without simulating again.
+
+            If `use_reachability_prescreen` is set, the drift simulation is skipped when the
+            shoreline is farther away than the ship can drift before the simulation ends
+            (see `simulation_end_time`), and the end time is used as the time to grounding,
+            as the simulation reports for a ship that does not ground. The time to grounding
+            is therefore the same with and without the pre-screen. `drift_simulation_skipped`
+            tells whether the simulation was skipped. The reach is a heuristic bound that has
+            only been checked for a range of ship settings (see
+            drift_model.drift_speed_upper_bound), so turn the pre-screen off for ships
+            outside it.
+
+            If `adaptive_integration` is given, the drift is integrated with adaptive steps
+            (see TimeToGroundingSimulator). `trajectory_recording` sets how much of the drift
+            trajectory the simulator records.
+
+            If `ttg_cache` is given, the time to grounding is looked up in the cache before
+            simulating, keyed on the quantized initial states and environment, `chart_id`,
+            which must identify the shoreline in `environment`, and every setting the time to
+            grounding depends on: the ship configuration, the maximum drift time, the
+            integration step and simulation time of `sim_config`, `adaptive_integration`,
+            `use_reachability_prescreen` and whether the shoreline is clipped. One cache can
+            therefore be shared by models with different settings.
+
+            If `clip_shoreline_to_reach` is set and no `shoreline_index` is given, the shoreline
+            is first clipped to the region the ship can reach within `max_drift_time_s` (see
+            shoreline.clip_to_reachable_region), so that the index is built over, and queries
+            only search, the part of the shoreline that matters.
+
+            If `instrumentation` is given, the drift simulation and scenario calculations
+            add their wall time per phase, step and query counts and the reason the drift
+            simulation ended (grounded, maximum simulation time reached, shoreline out of
+            reach or cache hit) to it.
+
+            `consequence_index` gives the shore character used for the consequence in
+            `grounding_outcome`.
+        '''
+        if ttg_cache is not None and chart_id is None:
+            raise ValueError('A chart_id identifying the environment is required when using a ttg_cache')
         self.max_simulation_time = risk_model_config.max_drift_time_s
         self.risk_time_interval = risk_model_config.risk_time_interval
         self.ship_config = ttg_sim_config
         self.sim_config = sim_config
         self.env_config = env_config
         self.environment = environment
+        self.shoreline_index = shoreline_index
         self.scenario_params = scenario_params
+        self.use_reachability_prescreen = use_reachability_prescreen
+        self.adaptive_integration = adaptive_integration
+        self.clip_shoreline_to_reach = clip_shoreline_to_reach and shoreline_index is None
+        # Same as TimeToGroundingSimulator.simulation_end_time, which is needed before the simulator is set up
+        self.simulation_end_time = self.max_simulation_time if adaptive_integration is not None \
+            else sim_config.simulation_time
+        self.drift_simulation_skipped = False
+        self._time_to_grounding = None
+        self.ttg_cache = ttg_cache
+        self.chart_id = chart_id
+        self.instrumentation = instrumentation
         self.initial_states = MotionStateInput(sim_config.initial_north_position_m,
                                                sim_config.initial_east_position_m,
                                                sim_config.initial_yaw_angle_rad,
                                                sim_config.initial_forward_speed_m_per_s,
                                                sim_config.initial_sideways_speed_m_per_s,
                                                sim_config.initial_yaw_rate_rad_per_s)
+        if self.clip_shoreline_to_reach:
+            self.environment = clip_to_reachable_region(shoreline=environment,
+                                                        north=self.initial_states.north_position,
+                                                        east=self.initial_states.east_position,
+                                                        reachable_distance=self.max_reachable_distance())
 
         self.ttg_simulator = TimeToGroundingSimulator(max_simulation_time=self.max_simulation_time,
                                                       ship_config=self.ship_config,
                                                       simulation_config=self.sim_config,
                                                       environment_config=self.env_config,
                                                       environment=self.environment,
-                                                      initial_states=self.initial_states)
-        self.risk_model_output = self.calculate_risk_output()
+                                                      initial_states=self.initial_states,
+                                                      shoreline_index=self.shoreline_index,
+                                                      adaptive_integration=adaptive_integration,
+                                                      trajectory_recording=trajectory_recording,
+                                                      instrumentation=instrumentation,
+                                                      consequence_index=consequence_index)
+
+    @property
+    def risk_model_output(self):
+        return self.calculate_risk_output()
+
+    @property
+    def time_to_grounding(self) -> float:
+        ''' Time to grounding from the initial states, simulated on first access.
+        '''
+        if self._time_to_grounding is None:
+            if self.ttg_cache is None:
+                self._time_to_grounding = self._find_time_to_grounding()
+            else:
+                key = self.ttg_cache.key(self.initial_states, self.env_config, self.chart_id,
+                                         self.ship_config, self.max_simulation_time, self.sim_config.integration_step,
+                                         self.sim_config.simulation_time, self.adaptive_integration,
+                                         self.use_reachability_prescreen, self.clip_shoreline_to_reach)
+                self._time_to_grounding = self.ttg_cache.get(key)
+                if self._time_to_grounding is None:
+                    self._time_to_grounding = self._find_time_to_grounding()
+                    self.ttg_cache.put(key, self._time_to_grounding)
+                elif self.instrumentation is not None:
+                    self.instrumentation.early_exit(CACHE_HIT)
+        return self._time_to_grounding
+
+    @property
+    def grounding_outcome(self) -> GroundingOutcome:
+        ''' Impact point, impact speed and consequence of grounding (see
+            TimeToGroundingSimulator.grounding_outcome), with the model's own
+            `time_to_grounding`, the one the risk is calculated from.
+
+            The impact is always found by running the drift simulation, also when the time
+            to grounding was found without it. After a cache hit, the time to grounding was
+            simulated from initial states that only agree with these to within the cache
+            tolerances, so it can differ from the time at which the simulated ship grounds.
+        '''
+        return self.ttg_simulator.grounding_outcome()._replace(time_to_grounding=self.time_to_grounding)
+
+    def _find_time_to_grounding(self) -> float:
+        self.drift_simulation_skipped = self.use_reachability_prescreen and self.shoreline_out_of_reach()
+        if self.drift_simulation_skipped:
+            if self.instrumentation is not None:
+                self.instrumentation.early_exit(SHORELINE_OUT_OF_REACH)
+            return self.simulation_end_time
+        return self.ttg_simulator.time_to_grounding()
 
     def calculate_risk_output(self):
-        time_to_grounding = self.ttg_simulator.time_to_grounding()
-        return self.scenario_analysis(available_recovery_time=time_to_grounding)
+        return self.scenario_analysis(available_recovery_time=self.time_to_grounding)
 
+    def evaluate_scenarios(self, scenario_params: List[ScenarioAnalysisParameters]) -> List[float]:
+        ''' Probability of grounding for each set of scenario parameters, all evaluated
+            against the same (cached) time to grounding.
+        '''
+        return [self.scenario_analysis(available_recovery_time=self.time_to_grounding, scenario_params=params)
+                for params in scenario_params]
+
+    def monte_carlo_risk_output(self, uncertainty: EnvironmentUncertainty,
+                                target_relative_half_width: float = 0.05,
+                                confidence_level: float = 0.95,
+                                batch_size: int = 256,
+                                max_number_of_samples: int = 100000,
+                                random_state: np.random.Generator = None) -> MonteCarloResult:
+        ''' Propagate the uncertainty in wind and current to the probability of grounding.
+
+            The environment is sampled in batches, and each batch of drift simulations is
+            run in lockstep by BatchTimeToGroundingSimulator (skipping samples where the
+            shoreline is out of reach, as in `time_to_grounding`). Sampling stops once the
+            half width of the normal confidence interval of the mean probability of
+            grounding is at most `target_relative_half_width` times the mean, or after
+            `max_number_of_samples` samples.
+        '''
+        import scipy.special
+
+        if random_state is None:
+            random_state = np.random.default_rng()
+        shoreline_index = self.ttg_simulator.shoreline_index
+        scenario = CompiledLossOfMainEngineScenario(risk_time_interval=self.risk_time_interval,
+                                                    scenario_parameters=self.scenario_params)
+        nominal_params = drift_model_parameters(ship_config=self.ship_config, environment_config=self.env_config)
+        z = scipy.special.ndtri(0.5 + 0.5 * confidence_level)
+
+        number_of_samples = 0
+        sum_of_probabilities = 0.0
+        sum_of_squared_probabilities = 0.0
+        while number_of_samples < max_number_of_samples:
+            size = min(batch_size, max_number_of_samples - number_of_samples)
+            params = nominal_params._replace(**{
+                field: distribution.rvs(size=size, random_state=random_state)
+                for field, distribution in uncertainty._asdict().items() if distribution is not None
+            })
+            initial_states = np.tile(np.array(self.initial_states, dtype=float), (size, 1))
+            times_to_grounding = screened_times_to_grounding(initial_states, shoreline_index, params,
+                                                             self.simulation_end_time,
+                                                             self.sim_config.integration_step)
+            probabilities = scenario.scenario_probabilities(times_to_grounding)
+            number_of_samples += size
+            sum_of_probabilities += float(np.sum(probabilities))
+            sum_of_squared_probabilities += float(np.sum(probabilities ** 2))
+
+            mean = sum_of_probabilities / number_of_samples
+            variance = max(sum_of_squared_probabilities / number_of_samples - mean ** 2, 0.0) \
+                * number_of_samples / max(number_of_samples - 1, 1)
+            half_width = float(z * np.sqrt(variance / number_of_samples))
+            if half_width <= target_relative_half_width * mean:
+                break
+        return MonteCarloResult(mean_probability_of_grounding=mean,
+                                confidence_interval=(mean - half_width, mean + half_width),
+                                number_of_samples=number_of_samples)
+
+    def max_reachable_distance(self) -> float:
+        ''' Upper bound on the distance the ship can drift before the simulation ends,
+            including the integration step the simulation runs past it (see
+            drift_model.max_reachable_distances).
+        '''
+        params = drift_model_parameters(ship_config=self.ship_config, environment_config=self.env_config)
+        return float(max_reachable_distances(np.array([self.initial_states], dtype=float), params,
+                                             self.simulation_end_time, self.sim_config.integration_step)[0])
 
-    def scenario_analysis(self, available_recovery_time: float):
+    def shoreline_out_of_reach(self) -> bool:
+        ''' Returns True if the ship cannot drift far enough to ground before the
+            simulation ends.
+        '''
+        params = drift_model_parameters(ship_config=self.ship_config, environment_config=self.env_config)
+        return bool(shoreline_out_of_reach(np.array([self.initial_states], dtype=float),
+                                           self.ttg_simulator.shoreline_index, params, self.simulation_end_time,
+                                           self.sim_config.integration_step)[0])
+
+    def scenario_analysis(self, available_recovery_time: float,
+                          scenario_params: ScenarioAnalysisParameters = None):
+        if scenario_params is None:
+            scenario_params = self.scenario_params
         return LossOfMainEngineScenario(
             available_recovery_time=available_recovery_time, 
             risk_time_interval=self.risk_time_interval,
-            scenario_parameters=self.scenario_params
+            scenario_parameters=scenario_params,
+            instrumentation=self.instrumentation
             ).scenario_probabilities()
 
 
@@ -88,8 +316,12 @@ class LossOfMainEngineScenario:
             self,
             available_recovery_time: float,
             risk_time_interval: float,
-            scenario_parameters: ScenarioAnalysisParameters
+            scenario_parameters: ScenarioAnalysisParameters,
+            instrumentation: Instrumentation = None
     ) -> None:
+        if instrumentation is not None:
+            construction_start = time.perf_counter()
+        self.instrumentation = instrumentation
         self.scenario_params = scenario_parameters
         self.risk_time_interval = risk_time_interval
         main_engine_stops = scenarios.TriggeringEvent(rate_of_occurrence=self.scenario_params.main_engine_failure_rate,
@@ -118,10 +350,13 @@ class LossOfMainEngineScenario:
             loss_scenario=loss_of_main_engine,
             restoration_scenario=restore_from_loss_of_main_engine
         )
+        if instrumentation is not None:
+            instrumentation.add_phase_time(SCENARIO_CONSTRUCTION, time.perf_counter() - construction_start)
     
     def scenario_probabilities(self) -> float:
         return scenarios.ScenarioProbabilityCalculation(
-            possible_scenarios=[self.loss_of_main_engine]
+            possible_scenarios=[self.loss_of_main_engine],
+            instrumentation=self.instrumentation
         ).probability_of_grounding
 
 
@@ -135,125 +370,231 @@ class TimeToGroundingSimulator:
                  max_simulation_time: float,
                  ship_config: ShipConfiguration,
                  simulation_config: SimulationConfiguration,
-                 environment_config: EnvironmentConfiguration):
+                 environment_config: EnvironmentConfiguration,
+                 shoreline_index: ShorelineIndex = None,
+                 adaptive_integration: AdaptiveIntegrationSettings = None,
+                 trajectory_recording: TrajectoryRecordingConfiguration = TrajectoryRecordingConfiguration(),
+                 ship_model_factory: Callable = ShipModelWithoutPropulsion,
+                 instrumentation: Instrumentation = None,
+                 consequence_index: ShoreCharacterIndex = None):
         ''' Set up simulation.
 
             args:
             - initial_states (MotionStateInput): See MotionStateInput-class
             - max_simulation_time (float): Number of seconds after which to terminate simulation if
             grounding has not occurred.
+            - shoreline_index (ShorelineIndex or DistanceRaster): Spatial index over `environment`.
+            Pass the same index to all simulators using the same environment to avoid rebuilding
+            it. A DistanceRaster gives constant time grounding checks. If not given, a
+            ShorelineIndex is built from `environment`.
+            - adaptive_integration (AdaptiveIntegrationSettings): If given, the drift is integrated
+            with an adaptive Dormand-Prince 5(4) scheme and the grounding time is located to within
+            the time tolerance in the settings, instead of using the fixed integration step of
+            the ship model. No trajectory is recorded in this mode.
+            - trajectory_recording (TrajectoryRecordingConfiguration): How much of the trajectory to
+            record in `trajectory`. The recording arrays are allocated up front, sized from
+            `simulation_end_time`, so nothing is allocated per step.
+            - ship_model_factory (callable): Creates the drifting ship model from the ship,
+            environment and simulation configurations. Defaults to ShipModelWithoutPropulsion.
+            - instrumentation (Instrumentation): If given, the integration, shoreline query and
+            recording times, the number of integration steps and shoreline queries and whether
+            the ship grounded are added to it after the simulation. Without it, the simulation
+            loop does no timing.
+            - consequence_index (ShoreCharacterIndex): Attributed shore segments giving the
+            character of the shore at the grounding position, used by `grounding_outcome`.
         '''
         self.initial_states = initial_states
         self.max_sim_time = max_simulation_time
         self.environment = environment
+        if shoreline_index is None:
+            shoreline_index = ShorelineIndex(environment)
+        self.shoreline_index = shoreline_index
+        self.adaptive_integration = adaptive_integration
+        self.adaptive_integration_result = None
+        self.instrumentation = instrumentation
+        self.consequence_index = consequence_index
+        self.grounded = False
+        self._time_to_grounding = None
         self.ship_config = ship_config
         self.simulation_config = simulation_config
         self.environment_config = environment_config
-        self.ship_model = ShipModelWithoutPropulsion(ship_config=self.ship_config,
-                                                     environment_config=self.environment_config,
-                                                     simulation_config=self.simulation_config)
+        self.ship_model = ship_model_factory(ship_config=self.ship_config,
+                                             environment_config=self.environment_config,
+                                             simulation_config=self.simulation_config)
+        self.trajectory_recording = trajectory_recording
+        self._trajectory = None
+        self._number_of_recorded_samples = 0
+
+    @property
+    def trajectory(self) -> np.ndarray:
+        ''' Recorded drift trajectory as a structured array with TRAJECTORY_DTYPE. Empty if
+            nothing has been recorded.
+        '''
+        if self._trajectory is None:
+            return np.empty(0, dtype=TRAJECTORY_DTYPE)
+        return self._trajectory[:self._number_of_recorded_samples]
+
+    @property
+    def simulation_end_time(self) -> float:
+        ''' Time at which the simulation of a ship that does not ground ends: the maximum
+            simulation time with adaptive integration, otherwise the simulation time of the
+            ship model.
+        '''
+        if self.adaptive_integration is not None:
+            return self.max_sim_time
+        return self.ship_model.int.sim_time
 
     def time_to_grounding(self):
-        ''' Find the time it will take to ground and the magnitude of the consequence
-            of grounding based on the speed of impact and the character of the shore
-            (whether or not the ship hits infrastructure such as fish-farms. If the
-            simulation is terminated before grounding occurs, the consequence of grounding
-            is calculated based on the speed of the ship when the simulation is terminated
-            and the cheapest shore character.
+        ''' Find the time it will take to ground. See `grounding_outcome` for the point,
+            speed and consequence of the impact.
 
             returns:
-            - time_to_grounding (float): Number of seconds it takes before the ship grounds
-            - consequence_of_grounding (float): The cost of the impact.
+            - time_to_grounding (float): Number of seconds it takes before the ship grounds,
+            or `simulation_end_time` if it does not ground
+
+            The shoreline is only queried when the ship has moved farther from the position
+            of the previous query than the clearance found there. Before that, the triangle
+            inequality guarantees that the ship cannot have grounded, so the grounding time
+            is the same as when checking every step.
+
+            The ship model is only simulated on the first call, later calls return the
+            same result.
         '''
+        if self._time_to_grounding is None:
+            self._time_to_grounding = self._simulate_time_to_grounding()
+        return self._time_to_grounding
+
+    def _simulate_time_to_grounding(self):
+        instrumentation = self.instrumentation
+        shoreline_index = self.shoreline_index
+        if instrumentation is not None:
+            shoreline_index = CountingShorelineIndex(shoreline_index)
+            simulation_start = time.perf_counter()
+        if self.adaptive_integration is not None:
+            self.adaptive_integration_result = adaptive_time_to_grounding(
+                initial_states=self.initial_states,
+                shoreline_index=shoreline_index,
+                max_simulation_time=self.max_sim_time,
+                params=drift_model_parameters(ship_config=self.ship_config,
+                                              environment_config=self.environment_config),
+                settings=self.adaptive_integration
+            )
+            if instrumentation is not None:
+                self._report(instrumentation, shoreline_index, time.perf_counter() - simulation_start,
+                             recording_time=0.0,
+                             number_of_steps=self.adaptive_integration_result.number_of_steps,
+                             grounded=self.adaptive_integration_result.grounded)
+                instrumentation.count(REJECTED_INTEGRATION_STEPS,
+                                      self.adaptive_integration_result.number_of_rejected_steps)
+            self.grounded = self.adaptive_integration_result.grounded
+            return self.adaptive_integration_result.time_to_grounding
+
+        recording_mode = self.trajectory_recording.mode
+        if recording_mode == FULL_RECORDING:
+            recording_interval = 0.0
+            max_number_of_samples = int(self.simulation_end_time / self.ship_model.int.dt) + 2
+        elif recording_mode == DECIMATED_RECORDING:
+            recording_interval = self.trajectory_recording.decimation_interval_s
+            max_number_of_samples = int(self.simulation_end_time / recording_interval) + 2
+        elif recording_mode == NO_RECORDING:
+            max_number_of_samples = 0
+        else:
+            raise ValueError(f'Unknown trajectory recording mode: {recording_mode}')
+        if max_number_of_samples > 0:
+            self._trajectory = np.empty(max_number_of_samples, dtype=TRAJECTORY_DTYPE)
+            trajectory_columns = [self._trajectory[name] for name in TRAJECTORY_DTYPE.names]
+            next_recording_time = self.ship_model.int.time
+
+        timed = instrumentation is not None
+        recording_time = 0.0
+        number_of_steps = 0
         grounded = False
+        checked_north, checked_east = self.ship_model.north, self.ship_model.east
+        clearance = max(shoreline_index.grounding_clearance(north=checked_north, east=checked_east,
+                                                            grounding_distance=GROUNDING_DISTANCE_M), 0)
         while self.ship_model.int.time <= self.ship_model.int.sim_time and not grounded:
             self.ship_model.update_differentials()
             self.ship_model.integrate_differentials()
-            self.ship_model.store_simulation_data()
+            number_of_steps += 1
+            if max_number_of_samples > 0 and self.ship_model.int.time >= next_recording_time \
+                    and self._number_of_recorded_samples < max_number_of_samples:
+                if timed:
+                    recording_start = time.perf_counter()
+                self._record_sample(trajectory_columns)
+                next_recording_time += recording_interval
+                if timed:
+                    recording_time += time.perf_counter() - recording_start
             self.ship_model.int.next_time()
-            grounded = self.check_if_grounded(self.ship_model.north, self.ship_model.east)
-        time_to_grounding = self.ship_model.int.time
+            north, east = self.ship_model.north, self.ship_model.east
+            if math.hypot(north - checked_north, east - checked_east) < clearance:
+                continue
+            checked_north, checked_east = north, east
+            clearance = shoreline_index.grounding_clearance(north=north, east=east,
+                                                            grounding_distance=GROUNDING_DISTANCE_M)
+            grounded = clearance <= 0
+        time_to_grounding = self.ship_model.int.time if grounded else self.simulation_end_time
+        self.grounded = grounded
+        if timed:
+            self._report(instrumentation, shoreline_index, time.perf_counter() - simulation_start,
+                         recording_time=recording_time, number_of_steps=number_of_steps, grounded=grounded)
         return time_to_grounding
 
-    def check_if_grounded(self, ship_north_position_m, ship_east_position_m):
-        ship_center_point = geo.Point(ship_east_position_m, ship_north_position_m)
-        distance = ship_center_point.distance(self.environment)
-        if abs(distance) <= 50:
-            return True
-        return False
-
-
-class AccumulatedRiskInPredictionHorizon:
-    ''' Find the probability of an event occurring during a prediction horizon (consisting
-        of a set of small adjoining time intervals.
-
-        It is assumed that the event can occur only one time per prediction horizon.
-    '''
-
-    def __init__(self, conditional_probabilities_for_each_time_interval: List[float],
-                 consequence_of_accident_for_each_time_step: List[float]):
-        ''' For each small adjoining time interval, calculate:
-            - the unconditional probability of the event occurring for each time interval
-            - the unconditional risk ('probability of occurrence' times 'consequence of occurrence')
-            - the accumulated (cumulative) probability of the event having occurred in any of the
-            preceding time intervals after each time interval
-            - the accumulated risk so far in the prediction horizon after each time interval (i.e.
-            the cumulative distribution)
+    def grounding_outcome(self) -> GroundingOutcome:
+        ''' Find the time to grounding together with the point, the speed over ground and
+            the consequence of the impact. The consequence is based on the speed of impact
+            and the character of the shore in `consequence_index` (whether or not the ship
+            hits infrastructure such as fish-farms). If the simulation is terminated before
+            grounding occurs, the consequence is calculated based on the speed of the ship
+            when the simulation is terminated and the cheapest shore character. Without a
+            `consequence_index` the consequence is NaN.
         '''
-        # Find unconditional prob of accident for each time step
-        self.unconditional_probability_for_each_time_interval = []
-        self.unconditional_risk_at_each_time_interval = []
-        self.accumulated_probability_after_each_time_interval = []
-        self.accumulated_risk_after_each_time_interval = []
-        self.accumulated_probability = 0
-        self.accumulated_risk = 0
-
-        for cond_prob, consequence in zip(conditional_probabilities_for_each_time_interval,
-                                          consequence_of_accident_for_each_time_step):
-            print(self.accumulated_probability)
-            self.unconditional_probability_for_each_time_interval.append(
-                self.unconditional_probability_at_time_step(
-                    conditional_probability_this_time_step=cond_prob,
-                    probability_of_event_having_occurred=self.accumulated_probability
-                )
-            )
-            self.update_probability_that_accident_occurred()
-
-            self.unconditional_risk_at_each_time_interval.append(
-                self.unconditional_risk_each_time_step(
-                    unconditional_probability_this_time_step=self.unconditional_probability_for_each_time_interval[-1],
-                    consequence_this_time_step=consequence
-                )
-            )
-            self.update_risk()
-            self.accumulated_probability_after_each_time_interval.append(self.accumulated_probability)
-            self.accumulated_risk_after_each_time_interval.append(self.accumulated_risk)
-
-    def update_probability_that_accident_occurred(self):
-        self.accumulated_probability = sum(self.unconditional_probability_for_each_time_interval)
-
-    def update_risk(self):
-        self.accumulated_risk = sum(self.unconditional_risk_at_each_time_interval)
+        time_to_grounding = self.time_to_grounding()
+        if self.adaptive_integration_result is not None:
+            final_states = self.adaptive_integration_result.final_states
+        else:
+            ship = self.ship_model
+            final_states = np.array([ship.north, ship.east, ship.yaw_angle,
+                                     ship.forward_speed, ship.sideways_speed, ship.yaw_rate], dtype=float)
+        params = drift_model_parameters(ship_config=self.ship_config, environment_config=self.environment_config)
+        impact_north, impact_east = float(final_states[0]), float(final_states[1])
+        impact_speed = float(speeds_over_ground(final_states[np.newaxis], params)[0])
+        if self.consequence_index is None:
+            consequence = math.nan
+        else:
+            consequence = self.consequence_index.consequence(north=impact_north, east=impact_east,
+                                                             impact_speed=impact_speed, grounded=self.grounded)
+        return GroundingOutcome(time_to_grounding=time_to_grounding,
+                                grounded=self.grounded,
+                                impact_north=impact_north,
+                                impact_east=impact_east,
+                                impact_speed=impact_speed,
+                                consequence=consequence)
 
     @staticmethod
-    def unconditional_probability_at_time_step(conditional_probability_this_time_step: float,
-                                               probability_of_event_having_occurred: float):
-        """ The unconditional probability accounts for the possibility that the
-            event might have occurred already. Thus, the further out in the prediction
-            horizon, the smaller the unconditional probability will be (i.e. if it is
-            almost certain that the event has already occurred, and it can only occur
-            once, it is almost certain not to occur now).
-        """
-        return conditional_probability_this_time_step * (1 - probability_of_event_having_occurred)
-
-    @staticmethod
-    def unconditional_risk_each_time_step(unconditional_probability_this_time_step: float,
-                                          consequence_this_time_step: float):
-        ''' The unconditional risk for a given time step is the probability of an accident at
-            the given time step times the price (consequence) of the accident if it occurs at
-            the given time step.
+    def _report(instrumentation: Instrumentation, shoreline_index: CountingShorelineIndex, simulation_time: float,
+                recording_time: float, number_of_steps: int, grounded: bool):
+        ''' Add the measurements of one drift simulation to `instrumentation`. The integration
+            time is the simulation time not spent on shoreline queries or recording.
         '''
-        return unconditional_probability_this_time_step * consequence_this_time_step
+        instrumentation.add_phase_time(INTEGRATION, simulation_time - shoreline_index.query_time_s - recording_time)
+        instrumentation.add_phase_time(RECORDING, recording_time)
+        shoreline_index.report(instrumentation)
+        instrumentation.count(INTEGRATION_STEPS, number_of_steps)
+        instrumentation.early_exit(GROUNDED if grounded else MAX_SIMULATION_TIME_REACHED)
+
+    def _record_sample(self, trajectory_columns):
+        ship = self.ship_model
+        i = self._number_of_recorded_samples
+        for column, value in zip(trajectory_columns, (ship.int.time, ship.north, ship.east,
+                                                      ship.yaw_angle * 180 / np.pi, ship.forward_speed,
+                                                      ship.sideways_speed, ship.yaw_rate * 180 / np.pi)):
+            column[i] = value
+        self._number_of_recorded_samples += 1
+
+    def check_if_grounded(self, ship_north_position_m, ship_east_position_m):
+        return self.shoreline_index.is_grounded(north=ship_north_position_m,
+                                                east=ship_east_position_m,
+                                                grounding_distance=GROUNDING_DISTANCE_M)
 
 
 if __name__ == '__main__':
@@ -1,7 +1,7 @@
-from typing import NamedTuple, List
-from xmlrpc.client import Boolean
+from typing import NamedTuple, List, Sequence
 import numpy as np
-import scipy.stats
+
+from instrumentation import Instrumentation, SCENARIO_EVALUATIONS, SCENARIO_PROBABILITY
 
 
 class StartUpEventParameters(NamedTuple):
@@ -13,6 +13,9 @@ class StartUpEventParameters(NamedTuple):
 
 class StartUpEvent:
     def __init__(self, parameters: StartUpEventParameters, time_available):
+        import scipy.stats
+
+        self.parameters = parameters
         self.mu = parameters.mean_time_to_restart_s
         self.sigma = parameters.standard_deviation_time_to_restart
         self.startup_time_distribution = scipy.stats.lognorm(
@@ -31,6 +34,24 @@ class StartUpEvent:
         self.probability = self.probability_calculation(time)
 
 
+def startup_success_probabilities(parameters: StartUpEventParameters, times_available: np.ndarray) -> np.ndarray:
+    ''' Vectorized StartUpEvent.probability for an array of available times. Uses the
+        same shifted lognormal distribution of the time to restart as StartUpEvent, but
+        evaluates its cdf directly instead of through a frozen scipy distribution. The
+        fields of `parameters` may also be arrays broadcasting against the times.
+    '''
+    import scipy.special
+
+    scaled_times = (np.asarray(times_available, dtype=float) - parameters.time_shift_time_to_restart) \
+        / parameters.mean_time_to_restart_s
+    positive = scaled_times > 0
+    log_times = np.log(np.where(positive, scaled_times, 1.0))
+    cdf = np.where(positive,
+                   scipy.special.ndtr(log_times / np.sqrt(parameters.standard_deviation_time_to_restart)),
+                   0.0)
+    return parameters.nominal_success_probability * cdf
+
+
 class StartupEventSequence:
     ''' Assumes that all restart events are independent of each other
     '''
@@ -55,7 +76,7 @@ class StartupEventSequence:
 
 
 class PathElement:
-    def __init__(self, event: StartUpEvent, occurs: Boolean) -> None:
+    def __init__(self, event: StartUpEvent, occurs: bool) -> None:
         self.event = event
         self.occurs = occurs
 
@@ -124,13 +145,26 @@ class Scenario:
         self.restoration_scenario = restoration_scenario
 
     def update_scenario_probabilities(self, available_time):
-        self.restoration_scenario.probability_of_success(new_available_time=available_time)
+        self.restoration_scenario.probability = \
+            self.restoration_scenario.probability_of_success(new_available_time=available_time)
 
 
 class ScenarioProbabilityCalculation:
-    def __init__(self, possible_scenarios: List[Scenario]):
+    def __init__(self, possible_scenarios: List[Scenario], instrumentation: Instrumentation = None):
+        ''' If `instrumentation` is given, the time spent calculating the probability of
+            grounding and the number of scenarios evaluated are added to it.
+        '''
         self.scenarios = possible_scenarios
-        self.probability_of_grounding = self.probability_calculation()
+        self.instrumentation = instrumentation
+        self.probability_of_grounding = self._instrumented(self.probability_calculation)
+
+    def _instrumented(self, calculation):
+        if self.instrumentation is None:
+            return calculation()
+        with self.instrumentation.phase(SCENARIO_PROBABILITY):
+            result = calculation()
+        self.instrumentation.count(SCENARIO_EVALUATIONS, len(self.scenarios))
+        return result
 
     def probability_calculation(self):
         prod = 1
@@ -143,8 +177,95 @@ class ScenarioProbabilityCalculation:
         for s in self.scenarios:
             s.update_scenario_probabilities(available_time=available_time)
 
-    def update_probability(self, available_time, time_interval):
-        self.update_scenarios(available_time, time_interval)
-        self.probability_of_grounding = self.probability_calculation()
+    def update_probability(self, available_time):
+        self.update_scenarios(available_time)
+        self.probability_of_grounding = self._instrumented(self.probability_calculation)
+
+
+class CompiledEventTree:
+    ''' Array form of ScenarioProbabilityCalculation for any number of scenarios.
+
+        The restart events of all scenarios are stored once each, and every success path
+        is a row of `path_matrix` with +1 for events that occur, -1 for events that do
+        not occur and 0 for events that are not part of the path. The success
+        probability of each distinct event is then calculated once per available time,
+        and the probability of grounding for a whole array of available times is found
+        in one vectorized pass over the tree.
+    '''
+
+    def __init__(self, events: Sequence[StartUpEventParameters],
+                 path_matrix: np.ndarray,
+                 path_scenarios: Sequence[int],
+                 loss_probabilities: Sequence[float]):
+        ''' args:
+            - events: Parameters of each distinct restart event.
+            - path_matrix (np.ndarray): Array of shape (number of paths, number of events).
+            - path_scenarios: Index of the scenario each success path belongs to.
+            - loss_probabilities: Probability of each loss of propulsion scenario.
+        '''
+        self.events = list(events)
+        self.path_matrix = np.asarray(path_matrix, dtype=int).reshape(-1, len(self.events))
+        self.loss_probabilities = np.asarray(loss_probabilities, dtype=float)
+        self.scenario_paths = np.zeros((len(self.loss_probabilities), len(self.path_matrix)))
+        self.scenario_paths[np.asarray(path_scenarios, dtype=int), np.arange(len(self.path_matrix))] = 1
+        self.event_parameters = StartUpEventParameters(*(
+            np.array([getattr(event, field) for event in self.events], dtype=float)[:, np.newaxis]
+            for field in StartUpEventParameters._fields
+        ))
+
+    @classmethod
+    def from_scenarios(cls, possible_scenarios: List[Scenario]) -> 'CompiledEventTree':
+        ''' Compile the event trees of a list of scenarios, as used by
+            ScenarioProbabilityCalculation. Each restart event is evaluated once, also when
+            the same StartUpEvent appears in the paths of several scenarios. Separate
+            events are kept apart even if their parameters are equal.
+        '''
+        event_indices = {}
+        events = []
+        paths = []
+        path_scenarios = []
+        for scenario_index, scenario in enumerate(possible_scenarios):
+            for success_path in scenario.restoration_scenario.success_paths:
+                path = {}
+                for path_element in success_path.path:
+                    event = path_element.event
+                    if id(event) not in event_indices:
+                        event_indices[id(event)] = len(events)
+                        events.append(event)
+                    event_index = event_indices[id(event)]
+                    if event_index in path:
+                        raise ValueError('A restart event can only appear once in each success path')
+                    path[event_index] = 1 if path_element.occurs else -1
+                paths.append(path)
+                path_scenarios.append(scenario_index)
+        path_matrix = np.zeros((len(paths), len(events)), dtype=int)
+        for path_index, path in enumerate(paths):
+            for event_index, occurs in path.items():
+                path_matrix[path_index, event_index] = occurs
+        return cls(events=[event.parameters for event in events],
+                   path_matrix=path_matrix,
+                   path_scenarios=path_scenarios,
+                   loss_probabilities=[scenario.loss_scenario.probability for scenario in possible_scenarios])
+
+    def restoration_probabilities(self, available_times: np.ndarray) -> np.ndarray:
+        ''' Probability of restoring propulsion in time for each scenario (rows) and
+            available time (columns).
+        '''
+        times = np.atleast_1d(np.asarray(available_times, dtype=float))
+        event_probabilities = startup_success_probabilities(parameters=self.event_parameters, times_available=times)
+        occurs = (self.path_matrix == 1)[:, :, np.newaxis]
+        does_not_occur = (self.path_matrix == -1)[:, :, np.newaxis]
+        path_probabilities = np.prod(np.where(occurs, event_probabilities,
+                                              np.where(does_not_occur, 1 - event_probabilities, 1.0)), axis=1)
+        return self.scenario_paths @ path_probabilities
+
+    def probabilities_of_grounding(self, available_times: np.ndarray) -> np.ndarray:
+        ''' Probability of grounding for each available time, with the same formula as
+            ScenarioProbabilityCalculation.probability_calculation.
+        '''
+        probability_of_grounding_given_loss = 1 - self.restoration_probabilities(available_times)
+        prod = 1 - np.sum(probability_of_grounding_given_loss * self.loss_probabilities[:, np.newaxis], axis=0)
+        probabilities = 1 - prod
+        return probabilities.reshape(np.shape(available_times))
 
 
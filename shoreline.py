@@ -0,0 +1,375 @@
+"""
+    Provides spatial indexing of the shoreline used to decide whether a drifting ship
+    has grounded, so that the shoreline geometry is prepared once per environment and
+    shared between risk model instances.
+"""
+import json
+import os
+from typing import Dict, Tuple
+
+import numpy as np
+import shapely
+import shapely.geometry as geo
+
+from drift_model import GROUNDING_DISTANCE_M
+
+
+def shoreline_segments(shoreline: geo.base.BaseGeometry) -> np.ndarray:
+    ''' Split the boundary of the shoreline (polygon or multipolygon) into its
+        individual straight edges.
+
+        returns:
+        - segments (np.ndarray): Array of two-point shapely LineStrings
+    '''
+    segments = []
+    for polygon in shapely.get_parts(shoreline):
+        for ring in shapely.get_rings(polygon):
+            coordinates = shapely.get_coordinates(ring)
+            if len(coordinates) < 2:
+                continue
+            segments.append(np.stack([coordinates[:-1], coordinates[1:]], axis=1))
+    if not segments:
+        return np.empty(0, dtype=object)
+    return shapely.linestrings(np.concatenate(segments))
+
+
+def clip_to_reachable_region(shoreline: geo.base.BaseGeometry, north: float, east: float,
+                             reachable_distance: float, simplify_tolerance: float = 0.0,
+                             grounding_distance: float = GROUNDING_DISTANCE_M) -> geo.base.BaseGeometry:
+    ''' The part of the shoreline that matters for a ship that cannot move farther than
+        `reachable_distance` from the given position.
+
+        The shoreline is clipped to the square around the position extending
+        `reachable_distance + grounding_distance` in each direction. For every position
+        the ship can reach, the nearest shoreline within the grounding distance lies
+        inside the square, so grounding decisions are unchanged. Edges created along
+        the sides of the square lie on land, and can only make clearances at positions
+        farther from the shore larger. If `simplify_tolerance` is positive, the clipped
+        shoreline is also simplified, which moves it by at most that many meters.
+    '''
+    half_size = reachable_distance + grounding_distance
+    clipped = shapely.clip_by_rect(shoreline, east - half_size, north - half_size,
+                                   east + half_size, north + half_size)
+    if simplify_tolerance > 0:
+        clipped = shapely.simplify(clipped, simplify_tolerance, preserve_topology=True)
+    return clipped
+
+
+class ShorelineIndex:
+    ''' Spatial index over the edges of the shoreline. Build it once for an environment
+        and pass it to every GroundingRiskModel or TimeToGroundingSimulator using that
+        environment.
+
+        Distances are found with nearest-edge queries in an STRtree, while points on
+        land are detected using the prepared shoreline geometry, so the distances are
+        identical to `Point.distance(shoreline)`.
+    '''
+    error_bound = 0.0
+
+    def __init__(self, shoreline: geo.base.BaseGeometry):
+        self.shoreline = shoreline
+        self.segments = shoreline_segments(shoreline)
+        self.tree = shapely.STRtree(self.segments)
+        shapely.prepare(self.shoreline)
+
+    def distance(self, north: float, east: float) -> float:
+        ''' Distance in meters from the given position to the nearest shoreline. Zero
+            if the position is on land.
+        '''
+        if shapely.contains_xy(self.shoreline, east, north):
+            return 0.0
+        _, distances = self.tree.query_nearest(geo.Point(east, north), return_distance=True, all_matches=False)
+        if len(distances) == 0:
+            return np.inf
+        return float(distances[0])
+
+    def distances(self, north: np.ndarray, east: np.ndarray) -> np.ndarray:
+        ''' Vectorized version of `distance` for arrays of positions.
+        '''
+        return np.maximum(self.signed_distances(north, east), 0.0)
+
+    def signed_distances(self, north: np.ndarray, east: np.ndarray) -> np.ndarray:
+        ''' Distance from each position to the nearest shoreline edge, negative for
+            positions on land.
+        '''
+        north = np.asarray(north, dtype=float)
+        east = np.asarray(east, dtype=float)
+        points = shapely.points(east.ravel(), north.ravel())
+        (point_indices, _), nearest_distances = self.tree.query_nearest(points, return_distance=True,
+                                                                         all_matches=False)
+        result = np.full(points.shape, np.inf)
+        result[point_indices] = nearest_distances
+        on_land = shapely.contains_xy(self.shoreline, east.ravel(), north.ravel())
+        result[on_land] = -result[on_land]
+        return result.reshape(north.shape)
+
+    def is_grounded(self, north: float, east: float,
+                    grounding_distance: float = GROUNDING_DISTANCE_M) -> bool:
+        ''' Returns True if the given position is within `grounding_distance` meters
+            of the shoreline.
+        '''
+        if shapely.contains_xy(self.shoreline, east, north):
+            return True
+        nearest = self.tree.query_nearest(geo.Point(east, north), max_distance=grounding_distance,
+                                          all_matches=False)
+        return len(nearest) > 0
+
+    def grounding_clearance(self, north: float, east: float,
+                            grounding_distance: float = GROUNDING_DISTANCE_M) -> float:
+        ''' Distance in meters the ship can move from the given position before it can
+            ground. The position is grounded if and only if the clearance is not positive.
+        '''
+        return self.distance(north, east) - grounding_distance
+
+    def grounding_clearances(self, north: np.ndarray, east: np.ndarray,
+                             grounding_distance: float = GROUNDING_DISTANCE_M) -> np.ndarray:
+        ''' Vectorized version of `grounding_clearance` for arrays of positions.
+        '''
+        return self.distances(north, east) - grounding_distance
+
+
+class DistanceRaster:
+    ''' Signed distance to the shoreline sampled on a regular north-east grid (negative
+        on land), giving constant time grounding checks by bilinear interpolation.
+
+        The signed distance is 1-Lipschitz, so the interpolated distance differs from
+        the exact distance by at most `resolution / sqrt(2)` plus the rounding of the
+        stored values. This worst case is available as `error_bound`. Whenever the
+        interpolated distance is within `error_bound` of the grounding distance, or the
+        position is outside the grid, the exact check in the shoreline index is used.
+
+        Cell values are stored with grid[i, j] at north = north_origin + i * resolution
+        and east = east_origin + j * resolution.
+    '''
+
+    def __init__(self, grid: np.ndarray, north_origin: float, east_origin: float, resolution: float,
+                 shoreline_index: ShorelineIndex = None):
+        self.grid = grid
+        self.north_origin = north_origin
+        self.east_origin = east_origin
+        self.resolution = resolution
+        self.shoreline_index = shoreline_index
+        self.n_north, self.n_east = grid.shape
+        max_abs_value = float(np.max(np.abs(grid))) if grid.size else 0.0
+        rounding_error = max_abs_value * float(np.finfo(grid.dtype).eps)
+        self.error_bound = resolution / np.sqrt(2) + rounding_error
+
+    @classmethod
+    def from_shoreline_index(cls, shoreline_index: ShorelineIndex, resolution: float,
+                             bounds: Tuple[float, float, float, float] = None,
+                             dtype=np.float32) -> 'DistanceRaster':
+        ''' Sample the signed distance to the shoreline on a grid.
+
+            args:
+            - shoreline_index (ShorelineIndex): Index used for sampling and for the
+            exact fallback checks.
+            - resolution (float): Grid spacing in meters.
+            - bounds (tuple): (min_east, min_north, max_east, max_north) of the area to
+            cover. Defaults to the bounds of the shoreline.
+        '''
+        if bounds is None:
+            bounds = shoreline_index.shoreline.bounds
+        min_east, min_north, max_east, max_north = bounds
+        norths = min_north + resolution * np.arange(int(np.ceil((max_north - min_north) / resolution)) + 1)
+        easts = min_east + resolution * np.arange(int(np.ceil((max_east - min_east) / resolution)) + 1)
+        grid_north, grid_east = np.meshgrid(norths, easts, indexing='ij')
+        grid = shoreline_index.signed_distances(grid_north, grid_east).astype(dtype)
+        return cls(grid=grid, north_origin=min_north, east_origin=min_east,
+                   resolution=resolution, shoreline_index=shoreline_index)
+
+    def save(self, path: str):
+        ''' Write the grid to `path` (a .npy file, the extension is added if missing) and
+            its georeferencing to a .json file next to it.
+        '''
+        path = _with_extension(path, '.npy')
+        np.save(path, self.grid)
+        with open(_raster_metadata_path(path), 'w') as metadata_file:
+            json.dump({'north_origin': self.north_origin,
+                       'east_origin': self.east_origin,
+                       'resolution': self.resolution}, metadata_file)
+
+    @classmethod
+    def load(cls, path: str, shoreline_index: ShorelineIndex = None, memory_map: bool = True) -> 'DistanceRaster':
+        ''' Read a grid written by `save`. With `memory_map` the grid is mapped read-only,
+            so worker processes loading the same file share one copy in memory.
+        '''
+        path = _with_extension(path, '.npy')
+        grid = np.load(path, mmap_mode='r' if memory_map else None)
+        with open(_raster_metadata_path(path)) as metadata_file:
+            metadata = json.load(metadata_file)
+        return cls(grid=grid, shoreline_index=shoreline_index, **metadata)
+
+    def interpolated_distance(self, north: float, east: float) -> float:
+        ''' Bilinearly interpolated signed distance. NaN outside the grid.
+        '''
+        row = (north - self.north_origin) / self.resolution
+        column = (east - self.east_origin) / self.resolution
+        if not (0 <= row <= self.n_north - 1 and 0 <= column <= self.n_east - 1):
+            return np.nan
+        i = min(int(row), self.n_north - 2)
+        j = min(int(column), self.n_east - 2)
+        s = row - i
+        t = column - j
+        value = self.grid.item
+        return (1 - s) * ((1 - t) * value(i, j) + t * value(i, j + 1)) \
+            + s * ((1 - t) * value(i + 1, j) + t * value(i + 1, j + 1))
+
+    def distance(self, north: float, east: float) -> float:
+        ''' Approximate distance to the shoreline (zero on land), accurate to within
+            `error_bound` inside the grid and exact outside it.
+        '''
+        distance = self.interpolated_distance(north, east)
+        if np.isnan(distance):
+            return self._exact_index().distance(north, east)
+        return max(distance, 0.0)
+
+    def is_grounded(self, north: float, east: float,
+                    grounding_distance: float = GROUNDING_DISTANCE_M) -> bool:
+        ''' Same decision as `ShorelineIndex.is_grounded`, using the exact check only
+            when the interpolated distance is too close to the grounding distance to
+            decide.
+        '''
+        distance = self.interpolated_distance(north, east)
+        if np.isnan(distance) or abs(distance - grounding_distance) <= self.error_bound:
+            return self._exact_index().is_grounded(north, east, grounding_distance)
+        return distance < grounding_distance
+
+    def grounding_clearance(self, north: float, east: float,
+                            grounding_distance: float = GROUNDING_DISTANCE_M) -> float:
+        ''' Lower bound on the distance in meters the ship can move from the given position
+            before it can ground. Grounded if and only if the clearance is not positive,
+            consistent with `is_grounded`.
+        '''
+        distance = self.interpolated_distance(north, east)
+        if np.isnan(distance) or abs(distance - grounding_distance) <= self.error_bound:
+            return self._exact_index().grounding_clearance(north, east, grounding_distance)
+        return distance - grounding_distance - self.error_bound
+
+    def interpolated_distances(self, north: np.ndarray, east: np.ndarray) -> np.ndarray:
+        ''' Vectorized version of `interpolated_distance` for arrays of positions.
+        '''
+        row = (np.asarray(north, dtype=float) - self.north_origin) / self.resolution
+        column = (np.asarray(east, dtype=float) - self.east_origin) / self.resolution
+        inside = (row >= 0) & (row <= self.n_north - 1) & (column >= 0) & (column <= self.n_east - 1)
+        i = np.clip(row.astype(int), 0, self.n_north - 2)
+        j = np.clip(column.astype(int), 0, self.n_east - 2)
+        s = row - i
+        t = column - j
+        grid = self.grid
+        distances = (1 - s) * ((1 - t) * grid[i, j] + t * grid[i, j + 1]) \
+            + s * ((1 - t) * grid[i + 1, j] + t * grid[i + 1, j + 1])
+        return np.where(inside, distances, np.nan)
+
+    def grounding_clearances(self, north: np.ndarray, east: np.ndarray,
+                             grounding_distance: float = GROUNDING_DISTANCE_M) -> np.ndarray:
+        ''' Vectorized version of `grounding_clearance` for arrays of positions.
+        '''
+        north = np.asarray(north, dtype=float)
+        east = np.asarray(east, dtype=float)
+        distances = self.interpolated_distances(north, east)
+        clearances = distances - grounding_distance - self.error_bound
+        undecided = np.isnan(distances) | (np.abs(distances - grounding_distance) <= self.error_bound)
+        if np.any(undecided):
+            clearances[undecided] = self._exact_index().grounding_clearances(
+                north[undecided], east[undecided], grounding_distance)
+        return clearances
+
+    def _exact_index(self) -> ShorelineIndex:
+        if self.shoreline_index is None:
+            raise ValueError('An exact shoreline index is required for positions outside '
+                             'the grid or close to the grounding distance')
+        return self.shoreline_index
+
+
+def _raster_metadata_path(path: str) -> str:
+    return os.path.splitext(path)[0] + '.json'
+
+
+def _with_extension(path: str, extension: str) -> str:
+    ''' The path numpy writes to: np.save and np.savez append the extension if it is missing.
+    '''
+    return path if path.endswith(extension) else path + extension
+
+
+class ChartTileCache:
+    ''' Shoreline split into square tiles and stored as WKB in a binary cache file, so that
+        workers can load the shoreline of the region they need without reading the chart
+        source.
+
+        Tile (i, j) covers east in [east_origin + j * tile_size, east_origin + (j + 1) * tile_size)
+        and north in [north_origin + i * tile_size, north_origin + (i + 1) * tile_size). The
+        polygons are cut along the tile edges. The cut edges lie on land, so the shoreline
+        returned by `shoreline_in_region` gives the same distances to shore as the
+        original shoreline for positions in the water.
+    '''
+
+    def __init__(self, tiles: Dict[Tuple[int, int], bytes], north_origin: float, east_origin: float,
+                 tile_size: float):
+        self.tiles = tiles
+        self.north_origin = north_origin
+        self.east_origin = east_origin
+        self.tile_size = tile_size
+
+    @classmethod
+    def from_shoreline(cls, shoreline: geo.base.BaseGeometry, tile_size: float,
+                       simplify_tolerance: float = 0.0) -> 'ChartTileCache':
+        ''' Cut the shoreline into tiles, optionally simplifying it first (see
+            clip_to_reachable_region).
+        '''
+        if simplify_tolerance > 0:
+            shoreline = shapely.simplify(shoreline, simplify_tolerance, preserve_topology=True)
+        min_east, min_north, max_east, max_north = shoreline.bounds
+        tiles = {}
+        for i in range(int(np.ceil((max_north - min_north) / tile_size)) or 1):
+            for j in range(int(np.ceil((max_east - min_east) / tile_size)) or 1):
+                tile = shapely.clip_by_rect(shoreline, min_east + j * tile_size, min_north + i * tile_size,
+                                            min_east + (j + 1) * tile_size, min_north + (i + 1) * tile_size)
+                if not tile.is_empty:
+                    tiles[(i, j)] = shapely.to_wkb(tile)
+        return cls(tiles=tiles, north_origin=min_north, east_origin=min_east, tile_size=tile_size)
+
+    def save(self, path: str):
+        ''' Write the tiles to an uncompressed .npz file (the extension is added if
+            missing): a table of tile indices with offsets into one buffer holding the WKB
+            of all tiles.
+        '''
+        keys = sorted(self.tiles)
+        lengths = np.array([len(self.tiles[key]) for key in keys], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])).astype(np.int64)
+        table = np.column_stack([np.array(keys, dtype=np.int64).reshape(-1, 2), offsets, lengths])
+        buffer = np.frombuffer(b''.join(self.tiles[key] for key in keys), dtype=np.uint8)
+        np.savez(_with_extension(path, '.npz'), table=table, buffer=buffer,
+                 origin=np.array([self.north_origin, self.east_origin, self.tile_size]))
+
+    @classmethod
+    def load(cls, path: str) -> 'ChartTileCache':
+        with np.load(_with_extension(path, '.npz')) as cache_file:
+            table = cache_file['table']
+            buffer = cache_file['buffer'].tobytes()
+            north_origin, east_origin, tile_size = cache_file['origin']
+        tiles = {(int(i), int(j)): buffer[offset:offset + length] for i, j, offset, length in table}
+        return cls(tiles=tiles, north_origin=float(north_origin), east_origin=float(east_origin),
+                   tile_size=float(tile_size))
+
+    def shoreline_in_region(self, bounds: Tuple[float, float, float, float]) -> geo.MultiPolygon:
+        ''' Shoreline from all tiles overlapping (min_east, min_north, max_east, max_north).
+        '''
+        min_east, min_north, max_east, max_north = bounds
+        first_row, last_row = (int(np.floor((value - self.north_origin) / self.tile_size))
+                               for value in (min_north, max_north))
+        first_column, last_column = (int(np.floor((value - self.east_origin) / self.tile_size))
+                                     for value in (min_east, max_east))
+        wkbs = [self.tiles[(i, j)]
+                for i in range(first_row, last_row + 1) for j in range(first_column, last_column + 1)
+                if (i, j) in self.tiles]
+        polygons = shapely.get_parts(shapely.from_wkb(wkbs)) if wkbs else []
+        polygons = [polygon for polygon in polygons if isinstance(polygon, geo.Polygon)]
+        return geo.MultiPolygon(polygons)
+
+    def shoreline_within_reach(self, north: float, east: float, reachable_distance: float,
+                               grounding_distance: float = GROUNDING_DISTANCE_M) -> geo.base.BaseGeometry:
+        ''' Shoreline reachable from the given position, as in clip_to_reachable_region.
+        '''
+        half_size = reachable_distance + grounding_distance
+        bounds = (east - half_size, north - half_size, east + half_size, north + half_size)
+        return shapely.clip_by_rect(self.shoreline_in_region(bounds), *bounds)
@@ -0,0 +1,226 @@
+"""
+    Provides an asyncio pipeline that turns a live feed of vessel states into a stream of
+    grounding risk results, running the drift simulations on a bounded executor.
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Dict, Hashable, NamedTuple, Tuple
+
+import numpy as np
+
+from drift_model import drift_model_parameters, screened_times_to_grounding
+from risk_core import CompiledLossOfMainEngineScenario, RiskModelConfiguration, ScenarioAnalysisParameters
+
+
+class VesselStateRecord(NamedTuple):
+    vessel_id: Hashable
+    states: Any
+    environment: Any
+
+
+class RiskResult(NamedTuple):
+    vessel_id: Hashable
+    states: Any
+    time_to_grounding: float
+    probability_of_grounding: float
+    latency_s: float
+
+
+class DriftRiskEvaluator:
+    ''' Time to grounding and probability of grounding for one vessel state
+        (MotionStateInput) and EnvironmentConfiguration, using the NumPy drift model.
+        Vessels that cannot reach the shoreline within the maximum drift time are not
+        simulated, as in GroundingRiskModel.
+    '''
+
+    def __init__(self, shoreline_index, risk_model_config: RiskModelConfiguration, ship_config,
+                 scenario_params: ScenarioAnalysisParameters, integration_step: float = 0.5):
+        self.shoreline_index = shoreline_index
+        self.max_drift_time = risk_model_config.max_drift_time_s
+        self.ship_config = ship_config
+        self.integration_step = integration_step
+        self.scenario = CompiledLossOfMainEngineScenario(risk_time_interval=risk_model_config.risk_time_interval,
+                                                         scenario_parameters=scenario_params)
+
+    def __call__(self, states, environment_config) -> Tuple[float, float]:
+        params = drift_model_parameters(self.ship_config, environment_config)
+        time_to_grounding = float(screened_times_to_grounding(np.array([states], dtype=float), self.shoreline_index,
+                                                              params, self.max_drift_time, self.integration_step)[0])
+        return time_to_grounding, float(self.scenario.scenario_probabilities(time_to_grounding))
+
+
+class StreamingMetrics:
+    ''' Counters and latencies (from receiving a record to emitting its result) of a
+        StreamingRiskService. Latency statistics cover the most recent results.
+    '''
+
+    def __init__(self, latency_window: int = 10000):
+        self.received = 0
+        self.processed = 0
+        self.dropped_stale = 0
+        self.latencies = deque(maxlen=latency_window)
+
+    @property
+    def mean_latency_s(self) -> float:
+        return float(np.mean(self.latencies)) if self.latencies else math.nan
+
+    @property
+    def max_latency_s(self) -> float:
+        return float(np.max(self.latencies)) if self.latencies else math.nan
+
+    def latency_percentile_s(self, percentile: float) -> float:
+        return float(np.percentile(self.latencies, percentile)) if self.latencies else math.nan
+
+
+_END_OF_STREAM = object()
+
+
+class StreamingRiskService:
+    ''' Evaluate the grounding risk for a stream of vessel states.
+
+        At most `max_concurrency` evaluations run at a time on the executor, and at most one
+        per vessel. If a newer record for a vessel arrives while an older one is still
+        waiting, the older one is dropped. The feed is not read further while
+        `max_pending_vessels` vessels are waiting, and evaluation pauses while
+        `output_buffer_size` results have not been consumed, so a slow consumer slows
+        down the reading of the feed instead of letting queues grow.
+    '''
+
+    def __init__(self, evaluate: Callable[[Any, Any], Tuple[float, float]],
+                 executor: Executor = None,
+                 max_concurrency: int = 4,
+                 max_pending_vessels: int = 1000,
+                 output_buffer_size: int = 100):
+        ''' args:
+            - evaluate (callable): Returns (time to grounding, probability of grounding) for
+            a MotionStateInput and an EnvironmentConfiguration, e.g. a DriftRiskEvaluator.
+            - executor (Executor): Executor running `evaluate`. The event loop's default
+            executor is used if not given.
+        '''
+        self.evaluate = evaluate
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_pending_vessels = max_pending_vessels
+        self.output_buffer_size = output_buffer_size
+        self.metrics = StreamingMetrics()
+
+    async def results(self, records: AsyncIterator) -> AsyncIterator[RiskResult]:
+        ''' Asynchronously iterate over the risk results for an async iterator of
+            (vessel ID, MotionStateInput, EnvironmentConfiguration) records. Results are
+            emitted as they complete, in order for each vessel.
+        '''
+        output = asyncio.Queue(maxsize=self.output_buffer_size)
+        processing = asyncio.ensure_future(self._process(records, output))
+        try:
+            while True:
+                result = await output.get()
+                if result is _END_OF_STREAM:
+                    break
+                yield result
+            await processing
+        finally:
+            if not processing.done():
+                processing.cancel()
+
+    async def _process(self, records: AsyncIterator, output: asyncio.Queue):
+        loop = asyncio.get_running_loop()
+        pending: Dict[Hashable, Tuple[VesselStateRecord, float]] = {}
+        in_flight = set()
+        ready = asyncio.Queue()
+        free_slots = asyncio.Semaphore(self.max_pending_vessels)
+
+        async def worker():
+            while True:
+                vessel_id = await ready.get()
+                if vessel_id is None:
+                    ready.task_done()
+                    return
+                record, received_at = pending.pop(vessel_id)
+                free_slots.release()
+                in_flight.add(vessel_id)
+                time_to_grounding, probability_of_grounding = await loop.run_in_executor(
+                    self.executor, self.evaluate, record.states, record.environment)
+                in_flight.discard(vessel_id)
+                if vessel_id in pending:
+                    ready.put_nowait(vessel_id)
+                latency = time.monotonic() - received_at
+                self.metrics.processed += 1
+                self.metrics.latencies.append(latency)
+                await output.put(RiskResult(vessel_id=vessel_id,
+                                            states=record.states,
+                                            time_to_grounding=time_to_grounding,
+                                            probability_of_grounding=probability_of_grounding,
+                                            latency_s=latency))
+                ready.task_done()
+
+        workers = [asyncio.ensure_future(worker()) for _ in range(self.max_concurrency)]
+        feed = records.__aiter__()
+        try:
+            while True:
+                try:
+                    vessel_id, states, environment = await _first_completed(feed.__anext__(), workers)
+                except StopAsyncIteration:
+                    break
+                self.metrics.received += 1
+                record = (VesselStateRecord(vessel_id, states, environment), time.monotonic())
+                if vessel_id in pending:
+                    pending[vessel_id] = record
+                    self.metrics.dropped_stale += 1
+                    continue
+                await _first_completed(free_slots.acquire(), workers)
+                pending[vessel_id] = record
+                if vessel_id not in in_flight:
+                    ready.put_nowait(vessel_id)
+            await _first_completed(ready.join(), workers)
+            for _ in workers:
+                ready.put_nowait(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            await output.put(_END_OF_STREAM)
+
+
+async def _first_completed(awaitable, workers):
+    ''' Result of `awaitable`, but stop early (raising its exception, and cancelling
+        `awaitable`) if a worker fails. Used for everything the feed processing waits
+        for, so that a failing evaluation is raised to the consumer even while reading
+        the feed or waiting for a free slot.
+    '''
+    waiting = asyncio.ensure_future(awaitable)
+    try:
+        done, _ = await asyncio.wait([waiting, *workers], return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            if task is not waiting:
+                task.result()
+        return await waiting
+    finally:
+        if not waiting.done():
+            waiting.cancel()
+
+
+async def synthetic_vessel_feed(initial_states: Dict[Hashable, Any], environment,
+                                number_of_updates: int, update_interval_s: float = 0.0,
+                                time_between_updates_s: float = 10.0,
+                                random_state: np.random.Generator = None) -> AsyncIterator[tuple]:
+    ''' Local stand-in for a live feed. Each vessel (MotionStateInput) moves along its
+        heading at its forward speed with small random heading changes, and one record
+        per vessel is yielded per update, `update_interval_s` seconds apart.
+    '''
+    if random_state is None:
+        random_state = np.random.default_rng()
+    states = dict(initial_states)
+    for _ in range(number_of_updates):
+        for vessel_id, vessel_states in states.items():
+            yield vessel_id, vessel_states, environment
+        await asyncio.sleep(update_interval_s)
+        for vessel_id, vessel_states in states.items():
+            distance = vessel_states.surge_speed * time_between_updates_s
+            states[vessel_id] = vessel_states._replace(
+                north_position=vessel_states.north_position + distance * math.cos(vessel_states.yaw_angle_rad),
+                east_position=vessel_states.east_position + distance * math.sin(vessel_states.yaw_angle_rad),
+                yaw_angle_rad=vessel_states.yaw_angle_rad + random_state.normal(0, 0.02)
+            )
@@ -0,0 +1,210 @@
+from typing import NamedTuple
+
+import numpy as np
+import pytest
+import shapely.geometry as geo
+
+from drift_model import BatchTimeToGroundingSimulator, EAST, NORTH, SURGE, SWAY, YAW, YAW_RATE, drift_derivatives, \
+    drift_model_parameters, max_reachable_distances, reference_model_deviation, screened_times_to_grounding
+from shoreline import GROUNDING_DISTANCE_M, ShorelineIndex
+
+
+class ShipConfiguration(NamedTuple):
+    coefficient_of_deadweight_to_displacement: float = 0.7
+    bunkers: float = 200000
+    ballast: float = 200000
+    length_of_ship: float = 80
+    width_of_ship: float = 16
+    added_mass_coefficient_in_surge: float = 0.4
+    added_mass_coefficient_in_sway: float = 0.4
+    added_mass_coefficient_in_yaw: float = 0.4
+    dead_weight_tonnage: float = 3850000
+    mass_over_linear_friction_coefficient_in_surge: float = 130
+    mass_over_linear_friction_coefficient_in_sway: float = 18
+    mass_over_linear_friction_coefficient_in_yaw: float = 90
+    nonlinear_friction_coefficient__in_surge: float = 2400
+    nonlinear_friction_coefficient__in_sway: float = 4000
+    nonlinear_friction_coefficient__in_yaw: float = 400
+
+
+class EnvironmentConfiguration(NamedTuple):
+    current_velocity_component_from_north: float
+    current_velocity_component_from_east: float
+    wind_speed: float
+    wind_direction: float
+
+
+def random_drift(number_of_ships, random_state, ship_config=ShipConfiguration()):
+    environment = EnvironmentConfiguration(
+        current_velocity_component_from_north=random_state.uniform(-2, 2, number_of_ships),
+        current_velocity_component_from_east=random_state.uniform(-2, 2, number_of_ships),
+        wind_speed=random_state.uniform(0, 35, number_of_ships),
+        wind_direction=random_state.uniform(-np.pi, np.pi, number_of_ships)
+    )
+    states = np.zeros((number_of_ships, 6))
+    states[:, YAW] = random_state.uniform(-np.pi, np.pi, number_of_ships)
+    states[:, SURGE] = random_state.uniform(-4, 10, number_of_ships)
+    states[:, SWAY] = random_state.uniform(-3, 3, number_of_ships)
+    states[:, YAW_RATE] = random_state.uniform(-0.03, 0.03, number_of_ships)
+    return states, drift_model_parameters(ship_config, environment)
+
+
+def max_drift_distances(states, params, max_simulation_time, integration_step):
+    ''' Largest distance of each ship from its initial position, integrated as the fixed
+        step simulators do.
+    '''
+    initial_positions = states[:, [NORTH, EAST]].copy()
+    max_distance = np.zeros(len(states))
+    time = 0.0
+    while time <= max_simulation_time:
+        states = states + integration_step * drift_derivatives(states, params)
+        time = time + integration_step
+        max_distance = np.maximum(max_distance, np.hypot(*(states[:, [NORTH, EAST]] - initial_positions).T))
+    return max_distance
+
+
+def test_drift_stays_within_max_reachable_distance():
+    ''' The ship never gets farther from its initial position than the reach bound,
+        including the step the fixed step simulators run past the maximum time.
+    '''
+    max_simulation_time, integration_step = 120.0, 0.5
+    states, params = random_drift(20000, np.random.default_rng(1))
+    reach = max_reachable_distances(states, params, max_simulation_time, integration_step)
+    assert np.all(max_drift_distances(states, params, max_simulation_time, integration_step) <= reach)
+
+
+def test_drift_stays_within_max_reachable_distance_for_long_drifts():
+    max_simulation_time, integration_step = 1000.0, 0.5
+    states, params = random_drift(1000, np.random.default_rng(6))
+    reach = max_reachable_distances(states, params, max_simulation_time, integration_step)
+    assert np.all(max_drift_distances(states, params, max_simulation_time, integration_step) <= reach)
+
+
+def test_drift_stays_within_max_reachable_distance_across_ship_settings():
+    ''' The reach bound holds for a range of added mass and damping settings, with the
+        nonlinear damping weak enough that surge and sway damping stay positive up to
+        15 m/s (see drift_speed_upper_bound).
+    '''
+    max_simulation_time, integration_step = 120.0, 0.5
+    random_state = np.random.default_rng(7)
+    for _ in range(20):
+        ship_config = ShipConfiguration(
+            added_mass_coefficient_in_surge=random_state.uniform(0.02, 1.5),
+            added_mass_coefficient_in_sway=random_state.uniform(0.02, 1.5),
+            added_mass_coefficient_in_yaw=random_state.uniform(0.02, 1.5),
+            mass_over_linear_friction_coefficient_in_surge=random_state.uniform(10, 400),
+            mass_over_linear_friction_coefficient_in_sway=random_state.uniform(5, 200),
+            mass_over_linear_friction_coefficient_in_yaw=random_state.uniform(5, 300)
+        )
+        nominal_params = drift_model_parameters(ship_config, EnvironmentConfiguration(0, 0, 0, 0))
+        ship_config = ship_config._replace(
+            nonlinear_friction_coefficient__in_surge=random_state.uniform(0, nominal_params.linear_damping_surge / 15),
+            nonlinear_friction_coefficient__in_sway=random_state.uniform(0, nominal_params.linear_damping_sway / 15),
+            nonlinear_friction_coefficient__in_yaw=random_state.uniform(0, 1000)
+        )
+        states, params = random_drift(300, random_state, ship_config)
+        reach = max_reachable_distances(states, params, max_simulation_time, integration_step)
+        assert np.all(max_drift_distances(states, params, max_simulation_time, integration_step) <= reach), \
+            ship_config
+
+
+def test_prescreen_agrees_with_simulation():
+    ''' Ships that ground on a straight shore are never put out of reach of it by the
+        pre-screen. The shore is placed across the direction the ship drifts in, just
+        inside the distance it drifts, so that every ship grounds.
+    '''
+    max_simulation_time, integration_step = 60.0, 0.5
+    random_state = np.random.default_rng(2)
+    states, params = random_drift(200, random_state)
+    for i in range(len(states)):
+        ship_params = params._replace(**{field: value[i] for field, value in params._asdict().items()
+                                         if np.ndim(value) > 0})
+        drift = states[i:i + 1].copy()
+        time = 0.0
+        while time <= max_simulation_time:
+            drift = drift + integration_step * drift_derivatives(drift, ship_params)
+            time = time + integration_step
+        displacement = drift[0, [NORTH, EAST]] - states[i, [NORTH, EAST]]
+        distance = np.hypot(*displacement)
+        direction = displacement / distance
+        across = np.array([-direction[1], direction[0]])
+        shore_start = states[i, [NORTH, EAST]] + direction * (distance * random_state.uniform(0.9, 1.0)
+                                                              + GROUNDING_DISTANCE_M)
+        corners = [shore_start - 1e5 * across, shore_start + 1e5 * across,
+                   shore_start + 1e5 * across + 1e5 * direction, shore_start - 1e5 * across + 1e5 * direction]
+        shoreline_index = ShorelineIndex(geo.Polygon([(east, north) for north, east in corners]))
+        simulator = BatchTimeToGroundingSimulator(initial_states=states[i:i + 1], shoreline_index=shoreline_index,
+                                                  max_simulation_time=max_simulation_time,
+                                                  integration_step=integration_step, params=ship_params)
+        simulator.time_to_grounding()
+        clearance = shoreline_index.grounding_clearance(north=states[i, NORTH], east=states[i, EAST],
+                                                        grounding_distance=GROUNDING_DISTANCE_M)
+        reach = max_reachable_distances(states[i:i + 1], ship_params, max_simulation_time, integration_step)[0]
+        assert simulator.grounded[0]
+        assert clearance <= reach
+
+
+def test_reported_upwind_case_is_within_reach():
+    ''' Ship moving astern into a strong wind, which drifts faster than the wind drift
+        speed while the relative wind exceeds the wind speed.
+    '''
+    max_simulation_time, integration_step = 60.0, 0.5
+    params = drift_model_parameters(ShipConfiguration(), EnvironmentConfiguration(0.0, 0.0, 27.0, 0.0))
+    for yaw in np.linspace(-np.pi, np.pi, 73):
+        states = np.array([[0.0, 0.0, yaw, -0.99, 0.0, -0.008]])
+        reach = max_reachable_distances(states, params, max_simulation_time, integration_step)[0]
+        drift = states.copy()
+        time = 0.0
+        while time <= max_simulation_time:
+            drift = drift + integration_step * drift_derivatives(drift, params)
+            time = time + integration_step
+            assert np.hypot(drift[0, NORTH], drift[0, EAST]) <= reach
+
+
+def test_drift_derivatives_match_reference_model():
+    ''' The vectorised drift model follows ShipModelWithoutPropulsion in the basic example.
+    '''
+    models = pytest.importorskip('ship_in_transit_simulator.models')
+    simulation_config = models.SimulationConfiguration(
+        initial_north_position_m=7098718,
+        initial_east_position_m=182500,
+        initial_yaw_angle_rad=200 * np.pi / 180,
+        initial_forward_speed_m_per_s=7,
+        initial_sideways_speed_m_per_s=0.4,
+        initial_yaw_rate_rad_per_s=0.01,
+        integration_step=0.5,
+        simulation_time=1000
+    )
+    environment_config = models.EnvironmentConfiguration(
+        current_velocity_component_from_north=-2,
+        current_velocity_component_from_east=1,
+        wind_speed=12,
+        wind_direction=0
+    )
+    deviation = reference_model_deviation(models.ShipConfiguration(*ShipConfiguration()), simulation_config,
+                                          environment_config, number_of_steps=2000)
+    assert np.all(deviation <= 1e-6)
+
+
+def test_ships_that_do_not_ground_get_max_simulation_time():
+    max_simulation_time, integration_step = 60.0, 0.5
+    states, params = random_drift(50, np.random.default_rng(3))
+    shoreline_index = ShorelineIndex(geo.Point(1e5, 1e5).buffer(100))
+    times_to_grounding = BatchTimeToGroundingSimulator(initial_states=states, shoreline_index=shoreline_index,
+                                                       max_simulation_time=max_simulation_time,
+                                                       integration_step=integration_step,
+                                                       params=params).time_to_grounding()
+    assert np.all(times_to_grounding == max_simulation_time)
+
+
+def test_screened_times_to_grounding_match_simulating_every_ship():
+    max_simulation_time, integration_step = 120.0, 0.5
+    states, params = random_drift(500, np.random.default_rng(4))
+    states[:, NORTH] = np.random.default_rng(5).uniform(-3000, 3000, len(states))
+    shoreline_index = ShorelineIndex(geo.Point(0, 0).buffer(1000))
+    simulator = BatchTimeToGroundingSimulator(initial_states=states, shoreline_index=shoreline_index,
+                                              max_simulation_time=max_simulation_time,
+                                              integration_step=integration_step, params=params)
+    screened = screened_times_to_grounding(states, shoreline_index, params, max_simulation_time, integration_step)
+    np.testing.assert_array_equal(screened, simulator.time_to_grounding())
+    assert 0 < np.count_nonzero(simulator.grounded) < len(states)
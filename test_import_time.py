@@ -0,0 +1,10 @@
+from import_time import CORE_MODULES, IMPORT_TIME_BUDGET_MS, measure_import_time
+
+
+def test_core_modules_import_within_budget():
+    ''' The core modules import in a fresh interpreter within the budget, without loading
+        any of the excluded modules.
+    '''
+    import_time_ms, excluded_modules_loaded = measure_import_time(CORE_MODULES, repeats=3)
+    assert excluded_modules_loaded == [], f'Importing {CORE_MODULES} loads {excluded_modules_loaded}'
+    assert import_time_ms <= IMPORT_TIME_BUDGET_MS
@@ -0,0 +1,12 @@
+import numpy as np
+
+from drift_model import EAST, NORTH, YAW
+from prediction_horizon import PredictedRoute
+
+
+def test_heading_is_constant_along_each_leg():
+    route = PredictedRoute.from_waypoints([(0, 0), (1000, 0), (1000, 1000)], speed=5)
+    states = route.states_at(np.array([0, 100, 199, 201, 300, 400]))
+    np.testing.assert_allclose(states[:, YAW], [0, 0, 0, np.pi / 2, np.pi / 2, np.pi / 2])
+    np.testing.assert_allclose(states[1, [NORTH, EAST]], [500, 0])
+    np.testing.assert_allclose(states[4, [NORTH, EAST]], [1000, 500])
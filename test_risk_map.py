@@ -0,0 +1,34 @@
+import numpy as np
+import shapely.geometry as geo
+
+from drift_model import BatchTimeToGroundingSimulator, drift_model_parameters
+from risk_core import RiskModelConfiguration, ScenarioAnalysisParameters
+from risk_map import RiskMapConfiguration, grounding_risk_map
+from shoreline import ShorelineIndex
+from test_drift_model import EnvironmentConfiguration, ShipConfiguration
+
+
+def test_prescreen_does_not_change_the_risk_map():
+    ''' Cells skipped by the reachability pre-screen get the same time to grounding as
+        when every cell is simulated.
+    '''
+    island = geo.MultiPolygon([geo.Point(0, 0).buffer(1000)])
+    environment = EnvironmentConfiguration(current_velocity_component_from_north=-0.5,
+                                           current_velocity_component_from_east=0.3,
+                                           wind_speed=15, wind_direction=0.5)
+    map_config = RiskMapConfiguration(region=(-3000, -3000, 3000, 3000), grid_spacing=500,
+                                      headings_rad=[0.0, np.pi / 2], speeds=[0.0, 3.0])
+    risk_model_config = RiskModelConfiguration(max_drift_time_s=300, risk_time_interval=10)
+    risk_map = grounding_risk_map(island, map_config, risk_model_config, ShipConfiguration(), environment,
+                                  ScenarioAnalysisParameters(3e-9, 50, 1.2, 20, 0.4), number_of_workers=1)
+
+    grid = np.meshgrid(risk_map.north_positions, risk_map.east_positions, risk_map.headings_rad, risk_map.speeds,
+                       indexing='ij')
+    initial_states = np.zeros((grid[0].size, 6))
+    initial_states[:, :4] = np.column_stack([dimension.ravel() for dimension in grid])
+    simulated = BatchTimeToGroundingSimulator(initial_states=initial_states, shoreline_index=ShorelineIndex(island),
+                                              max_simulation_time=300, integration_step=map_config.integration_step,
+                                              params=drift_model_parameters(ShipConfiguration(), environment))
+    np.testing.assert_array_equal(risk_map.time_to_grounding.ravel(), simulated.time_to_grounding())
+    assert 0 < np.count_nonzero(simulated.grounded) < len(initial_states)
+    assert np.all(risk_map.time_to_grounding.ravel()[~simulated.grounded] == 300)
@@ -0,0 +1,131 @@
+import numpy as np
+import pytest
+import shapely.geometry as geo
+
+models = pytest.importorskip('ship_in_transit_simulator.models')
+
+from caching import TimeToGroundingCache  # noqa: E402
+from drift_model import AdaptiveIntegrationSettings  # noqa: E402
+from risk_model import DECIMATED_RECORDING, FULL_RECORDING, GroundingRiskModel, MotionStateInput, \
+    RiskModelConfiguration, ScenarioAnalysisParameters, TimeToGroundingSimulator, \
+    TrajectoryRecordingConfiguration  # noqa: E402
+
+SHORE = geo.MultiPolygon([geo.Polygon([(181000, 7096000), (181500, 7096100), (181200, 7096600)]).buffer(30, 4)])
+SHIP_CONFIGURATION = models.ShipConfiguration(
+    coefficient_of_deadweight_to_displacement=0.7,
+    bunkers=200000,
+    ballast=200000,
+    length_of_ship=80,
+    width_of_ship=16,
+    added_mass_coefficient_in_surge=0.4,
+    added_mass_coefficient_in_sway=0.4,
+    added_mass_coefficient_in_yaw=0.4,
+    dead_weight_tonnage=3850000,
+    mass_over_linear_friction_coefficient_in_surge=130,
+    mass_over_linear_friction_coefficient_in_sway=18,
+    mass_over_linear_friction_coefficient_in_yaw=90,
+    nonlinear_friction_coefficient__in_surge=2400,
+    nonlinear_friction_coefficient__in_sway=4000,
+    nonlinear_friction_coefficient__in_yaw=400
+)
+ENVIRONMENT_CONFIGURATION = models.EnvironmentConfiguration(
+    current_velocity_component_from_north=-2,
+    current_velocity_component_from_east=1,
+    wind_speed=12,
+    wind_direction=0
+)
+
+
+def simulation_configuration(north=7096900, east=181250, simulation_time=1000):
+    return models.SimulationConfiguration(
+        initial_north_position_m=north,
+        initial_east_position_m=east,
+        initial_yaw_angle_rad=3.14,
+        initial_forward_speed_m_per_s=2,
+        initial_sideways_speed_m_per_s=0.4,
+        initial_yaw_rate_rad_per_s=0.01,
+        integration_step=0.5,
+        simulation_time=simulation_time
+    )
+
+
+RISK_MODEL_CONFIGURATION = RiskModelConfiguration(max_drift_time_s=1000, risk_time_interval=10)
+SCENARIO_PARAMETERS = ScenarioAnalysisParameters(
+    main_engine_failure_rate=3e-9,
+    main_engine_mean_restart_time=50,
+    main_engine_restart_time_std=1.2,
+    main_engine_restart_time_shift=20,
+    main_engine_nominal_restart_prob=0.4,
+)
+
+
+def risk_model(sim_config=None, **kwargs):
+    if sim_config is None:
+        sim_config = simulation_configuration()
+    return GroundingRiskModel(RISK_MODEL_CONFIGURATION, SHIP_CONFIGURATION, sim_config,
+                              ENVIRONMENT_CONFIGURATION, SHORE, SCENARIO_PARAMETERS, **kwargs)
+
+
+def test_cache_separates_integrator_settings():
+    cache = TimeToGroundingCache()
+    fixed_step = risk_model(ttg_cache=cache, chart_id='shore').time_to_grounding
+    adaptive = risk_model(ttg_cache=cache, chart_id='shore',
+                          adaptive_integration=AdaptiveIntegrationSettings()).time_to_grounding
+    assert fixed_step == risk_model().time_to_grounding
+    assert adaptive == risk_model(adaptive_integration=AdaptiveIntegrationSettings()).time_to_grounding
+    assert fixed_step != adaptive
+    assert risk_model(ttg_cache=cache, chart_id='shore').time_to_grounding == fixed_step
+    assert cache.statistics.hits == 1
+    assert cache.statistics.misses == 2
+    assert np.isfinite(fixed_step)
+
+
+def test_prescreen_does_not_change_the_time_to_grounding():
+    far_away = simulation_configuration(north=7140000)
+    for adaptive_integration in [None, AdaptiveIntegrationSettings()]:
+        screened = risk_model(sim_config=far_away, adaptive_integration=adaptive_integration)
+        simulated = risk_model(sim_config=far_away, adaptive_integration=adaptive_integration,
+                               use_reachability_prescreen=False)
+        assert screened.time_to_grounding == simulated.time_to_grounding == 1000
+        assert screened.drift_simulation_skipped
+        assert not simulated.ttg_simulator.grounded
+
+
+def test_grounding_outcome_reports_the_time_to_grounding_of_the_model():
+    cache = TimeToGroundingCache()
+    risk_model(ttg_cache=cache, chart_id='shore').time_to_grounding
+    nearby = risk_model(sim_config=simulation_configuration(north=7096901), ttg_cache=cache, chart_id='shore')
+    outcome = nearby.grounding_outcome
+    assert cache.statistics.hits == 1
+    assert outcome.grounded
+    assert outcome.time_to_grounding == nearby.time_to_grounding
+
+
+def test_cache_separates_simulation_times():
+    cache = TimeToGroundingCache()
+    short = risk_model(sim_config=simulation_configuration(simulation_time=100), ttg_cache=cache,
+                       chart_id='shore').time_to_grounding
+    long = risk_model(ttg_cache=cache, chart_id='shore').time_to_grounding
+    assert short == 100
+    assert long == risk_model().time_to_grounding < 1000
+    assert cache.statistics.misses == 2
+
+
+def test_trajectory_covers_the_whole_simulation():
+    ''' The fixed step simulation runs until the simulation time of the ship model, here
+        longer than the maximum simulation time, and all of it is recorded.
+    '''
+    sim_config = simulation_configuration(north=7140000, simulation_time=300)
+    for recording, number_of_samples in [(TrajectoryRecordingConfiguration(FULL_RECORDING), 601),
+                                         (TrajectoryRecordingConfiguration(DECIMATED_RECORDING, 20.0), 16)]:
+        initial_states = MotionStateInput(sim_config.initial_north_position_m, sim_config.initial_east_position_m,
+                                          sim_config.initial_yaw_angle_rad, sim_config.initial_forward_speed_m_per_s,
+                                          sim_config.initial_sideways_speed_m_per_s,
+                                          sim_config.initial_yaw_rate_rad_per_s)
+        simulator = TimeToGroundingSimulator(initial_states=initial_states, environment=SHORE, max_simulation_time=100,
+                                             ship_config=SHIP_CONFIGURATION, simulation_config=sim_config,
+                                             environment_config=ENVIRONMENT_CONFIGURATION,
+                                             trajectory_recording=recording)
+        assert simulator.time_to_grounding() == 300
+        assert len(simulator.trajectory) == number_of_samples
+        assert simulator.trajectory['time [s]'][-1] >= 300
@@ -0,0 +1,44 @@
+import numpy as np
+
+from scenarios import CompiledEventTree, EventTreePath, LossOfPropulsionScenario, PathElement, \
+    PowerRestorationEventTree, Scenario, ScenarioProbabilityCalculation, StartUpEvent, StartUpEventParameters, \
+    TriggeringEvent
+
+RESTART = StartUpEventParameters(50, 1.2, 20, 0.4)
+BACKUP_RESTART = StartUpEventParameters(120, 0.8, 40, 0.7)
+
+
+def scenarios(time_available):
+    ''' Two loss scenarios. The first has two separate restart events with equal
+        parameters, the second shares the first restart event of the first scenario.
+        Both have paths where an event does not occur.
+    '''
+    first_restart = StartUpEvent(RESTART, time_available)
+    second_restart = StartUpEvent(RESTART, time_available)
+    backup_restart = StartUpEvent(BACKUP_RESTART, time_available)
+    first_tree = PowerRestorationEventTree([
+        EventTreePath([PathElement(first_restart, False), PathElement(second_restart, True)]),
+        EventTreePath([PathElement(first_restart, True), PathElement(second_restart, True)]),
+    ], time_available)
+    second_tree = PowerRestorationEventTree([
+        EventTreePath([PathElement(first_restart, True)]),
+        EventTreePath([PathElement(first_restart, False), PathElement(backup_restart, True)]),
+    ], time_available)
+    return [Scenario(LossOfPropulsionScenario([TriggeringEvent(3e-4, 600)]), first_tree),
+            Scenario(LossOfPropulsionScenario([TriggeringEvent(1e-4, 600), TriggeringEvent(0.5, 1)]), second_tree)]
+
+
+def test_compiled_tree_matches_scenario_calculation():
+    times = np.array([0.0, 30.0, 80.0, 300.0, 1000.0])
+    compiled = CompiledEventTree.from_scenarios(scenarios(times[0]))
+    expected = [ScenarioProbabilityCalculation(scenarios(time)).probability_of_grounding for time in times]
+    assert compiled.path_matrix.shape == (4, 3)
+    np.testing.assert_allclose(compiled.probabilities_of_grounding(times), expected, rtol=1e-9)
+
+
+def test_update_probability_matches_new_calculation():
+    calculation = ScenarioProbabilityCalculation(scenarios(60.0))
+    for time in [300.0, 30.0, 1000.0]:
+        calculation.update_probability(time)
+        expected = ScenarioProbabilityCalculation(scenarios(time)).probability_of_grounding
+        assert calculation.probability_of_grounding == expected
@@ -0,0 +1,27 @@
+import numpy as np
+import shapely.geometry as geo
+
+from shoreline import ChartTileCache, DistanceRaster, ShorelineIndex
+
+SHORE = geo.MultiPolygon([geo.Polygon([(0, 0), (500, 100), (200, 600)]), geo.Polygon([(900, 900), (1200, 950),
+                                                                                      (1000, 1300)])])
+
+
+def test_tile_cache_round_trip_with_and_without_extension(tmp_path):
+    cache = ChartTileCache.from_shoreline(SHORE, tile_size=400)
+    for path in (str(tmp_path / 'tiles'), str(tmp_path / 'tiles.npz')):
+        cache.save(path)
+        loaded = ChartTileCache.load(path)
+        assert loaded.tiles == cache.tiles
+        assert (loaded.north_origin, loaded.east_origin, loaded.tile_size) == \
+            (cache.north_origin, cache.east_origin, cache.tile_size)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['tiles.npz']
+
+
+def test_distance_raster_round_trip_with_and_without_extension(tmp_path):
+    raster = DistanceRaster.from_shoreline_index(ShorelineIndex(SHORE), resolution=50)
+    for path in (str(tmp_path / 'raster'), str(tmp_path / 'raster.npy')):
+        raster.save(path)
+        loaded = DistanceRaster.load(path)
+        np.testing.assert_array_equal(loaded.grid, raster.grid)
+        assert loaded.resolution == raster.resolution
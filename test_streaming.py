@@ -0,0 +1,27 @@
+import asyncio
+import itertools
+
+import pytest
+
+from streaming import StreamingRiskService
+
+
+async def endless_feed():
+    for i in itertools.count():
+        yield i % 10, None, None
+        await asyncio.sleep(0)
+
+
+def failing_evaluation(states, environment):
+    raise RuntimeError('evaluation failed')
+
+
+async def consume(service):
+    async for _ in service.results(endless_feed()):
+        pass
+
+
+def test_failing_evaluation_is_raised_while_reading_the_feed():
+    service = StreamingRiskService(failing_evaluation, max_concurrency=1, max_pending_vessels=3)
+    with pytest.raises(RuntimeError, match='evaluation failed'):
+        asyncio.run(asyncio.wait_for(consume(service), timeout=10))